@@ -2,22 +2,35 @@ import os
 from dotenv import load_dotenv
 from flask import Flask, render_template
 from flask_jwt_extended import JWTManager
+from db.session import init_db
+from utils.compression import init_compression
+from utils.serialization import FastJSONProvider
 from routes.vehicle_routes import vehicle_bp
 from routes.driver_routes import driver_bp
 from routes.trip_logs_routes import trip_log_bp
 from routes.routes_routes import route_bp
 from routes.m_records_routes import maintenance_bp
 from routes.auth_routes import auth_bp
+from routes.stats_routes import stats_bp
 
 # load env variables
 load_dotenv()
 
 app = Flask(__name__)
 
+# encodes JSON responses with orjson when it is installed, dates as ISO 8601 and decimals as strings
+app.json = FastJSONProvider(app)
+
 # setting secret key for JWT
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
 jwt = JWTManager(app)
 
+# opens one database session per request and releases it when the request ends
+init_db(app)
+
+# compresses large JSON responses and exports with gzip, brotli or zstd, as the client accepts
+init_compression(app)
+
 # registers blueprint for vehicles endpoints
 app.register_blueprint(vehicle_bp)
 
@@ -36,6 +49,9 @@ app.register_blueprint(maintenance_bp)
 # register blueprint for auth endpoints
 app.register_blueprint(auth_bp)
 
+# register blueprint for operational statistics endpoints
+app.register_blueprint(stats_bp)
+
 # home page route
 @app.route('/')
 def home():
@@ -1,8 +1,9 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from db.pool import ObservedQueuePool, observe_pool
 
 # Acquiring .env contents 
 load_dotenv()
@@ -10,9 +11,54 @@ load_dotenv()
 # Storing url variable in local variable
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-# Creates db engine using parameters from url, create session factory (explicit commits, no automatic flushing of changes to db)   
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connection pool settings: persistent connections, extra overflow connections under load, seconds to wait for a
+# free connection, seconds before a connection is recycled, and whether connections are pinged before use
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() != 'false'
+# Checkouts waiting at least this many milliseconds for a connection are logged as a warning
+DB_POOL_SLOW_CHECKOUT_MS = float(os.getenv('DB_POOL_SLOW_CHECKOUT_MS', 100))
+
+# Compiled SQL statements kept per engine, large enough for every lookup, search and export shape the API produces
+DB_QUERY_CACHE_SIZE = int(os.getenv('DB_QUERY_CACHE_SIZE', 1200))
+# With the psycopg (3) driver, statements executed this many times on a connection become server-side prepared
+# statements (0 prepares every statement, empty disables it; psycopg2 has no prepared statements)
+DB_PREPARE_THRESHOLD = os.getenv('DB_PREPARE_THRESHOLD', '5')
+
+# Optional comma separated read replica urls, read-only requests are spread over them while writes stay on the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# Replicas lagging more than this many seconds behind the primary are skipped, lag is rechecked every interval
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', 5))
+DB_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 5))
+
+# Creates an engine with the shared pool settings
+def create_pooled_engine(url):
+    connect_args = {}
+    if make_url(url).get_driver_name() == 'psycopg':
+        connect_args['prepare_threshold'] = int(DB_PREPARE_THRESHOLD) if DB_PREPARE_THRESHOLD else None
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+        poolclass=ObservedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+# Creates db engine using parameters from url, create session factory (explicit commits, no automatic flushing of changes to db,
+# committed objects keep their loaded values so returning them does not cost another SELECT)
+engine = create_pooled_engine(DATABASE_URL)
+pool_stats = observe_pool(engine, DB_POOL_SLOW_CHECKOUT_MS)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# One engine per read replica, each with its own pool and statistics
+replica_engines = [create_pooled_engine(url) for url in DATABASE_REPLICA_URLS]
+replica_pool_stats = [observe_pool(replica, DB_POOL_SLOW_CHECKOUT_MS) for replica in replica_engines]
 
 # Creates base class (allows models to map to db automatically)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
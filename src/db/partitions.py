@@ -0,0 +1,50 @@
+# partitions.py
+import os
+from datetime import date
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# trip_logs is range partitioned by month on start_time (migration e4b8d1f6a3c9), partitions are kept ready for the
+# current month and TRIP_LOG_PARTITION_MONTHS_AHEAD months after it. Rows outside every partition go to trip_logs_default
+TRIP_LOG_PARTITION_MONTHS_AHEAD = int(os.getenv('TRIP_LOG_PARTITION_MONTHS_AHEAD', 3))
+
+# create_trip_log_partitions() is installed by the migrations, it skips partitions that already exist and moves the
+# rows of a new partition's month out of trip_logs_default
+CREATE_TRIP_LOG_PARTITIONS_SQL = text('SELECT create_trip_log_partitions(:from_month, :to_month)')
+
+# Months with rows in the default partition, each gets its own partition so pruning applies to those rows too
+DEFAULT_PARTITION_MONTHS_SQL = text(
+    "SELECT DISTINCT CAST(date_trunc('month', start_time) AS date) FROM trip_logs_default ORDER BY 1"
+)
+
+# Partitions of trip_logs with their bounds, in partition order (the default partition last)
+TRIP_LOG_PARTITIONS_SQL = text("""
+    SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = CAST('trip_logs' AS regclass)
+    ORDER BY child.relname = 'trip_logs_default', child.relname
+""")
+
+def add_months(month, months):
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+# Creates the missing partitions from the current month to months_ahead months ahead, plus one for every month whose
+# rows ended up in the default partition, and returns how many were created
+def create_trip_log_partitions(connection, months_ahead=TRIP_LOG_PARTITION_MONTHS_AHEAD, today=None):
+    this_month = (today or date.today()).replace(day=1)
+    created = 0
+    for month in connection.execute(DEFAULT_PARTITION_MONTHS_SQL).scalars().all():
+        created += connection.execute(CREATE_TRIP_LOG_PARTITIONS_SQL, {'from_month': month, 'to_month': month}).scalar()
+    created += connection.execute(CREATE_TRIP_LOG_PARTITIONS_SQL, {
+        'from_month': this_month,
+        'to_month': add_months(this_month, months_ahead),
+    }).scalar()
+    return created
+
+# Returns [(partition name, bounds)] for trip_logs
+def trip_log_partitions(connection):
+    return [tuple(row) for row in connection.execute(TRIP_LOG_PARTITIONS_SQL)]
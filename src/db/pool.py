@@ -0,0 +1,100 @@
+# pool.py
+import logging
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Counters describing how the connection pool is being used
+class PoolStats:
+    def __init__(self, slow_checkout_ms):
+        self.slow_checkout_ms = slow_checkout_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.last_wait_ms = 0.0
+
+    def record_wait(self, wait_ms):
+        with self._lock:
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.last_wait_ms = wait_ms
+        if wait_ms >= self.slow_checkout_ms:
+            logger.warning('Waited %.1f ms for a pooled database connection', wait_ms)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, pool):
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait_ms / waits, 3) if waits else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+                'last_wait_ms': round(self.last_wait_ms, 3),
+            }
+
+# QueuePool that records how long each checkout waited for a free connection
+class ObservedQueuePool(QueuePool):
+    stats = None
+
+    # engine.dispose() replaces the pool, keep counting into the same stats
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.increment('timeouts')
+            raise
+        finally:
+            self.stats.record_wait((time.perf_counter() - started) * 1000)
+
+# Attaches a PoolStats instance to the engine's pool and counts connects, checkouts, checkins and invalidations
+def observe_pool(engine, slow_checkout_ms):
+    stats = PoolStats(slow_checkout_ms)
+    engine.pool.stats = stats
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        stats.increment('connects')
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.increment('checkouts')
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        stats.increment('checkins')
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.increment('invalidations')
+        logger.warning('Pooled database connection invalidated: %s', exception)
+
+    return stats
@@ -0,0 +1,76 @@
+# replica.py
+import itertools
+import logging
+import threading
+import time
+from sqlalchemy import exc, text
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary, 0 when it has replayed everything it received (an idle primary leaves
+# the last replay timestamp old without the replica being stale) or when the server is not a standby at all
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# Measures the replication lag of one replica engine, only PostgreSQL reports it
+def measure_lag(replica):
+    if replica.dialect.name != 'postgresql':
+        return 0.0
+    with replica.connect() as connection:
+        return float(connection.execute(REPLICA_LAG_SQL).scalar())
+
+# Picks a replica for read-only requests, round robin over the replicas whose last measured lag is within the limit
+class ReplicaRouter:
+    def __init__(self, engines, max_lag_seconds, check_interval):
+        self.engines = engines
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.fallbacks = 0
+        self._lag = {}  # replica index -> (lag in seconds or None when unreachable, monotonic time measured)
+        self._order = itertools.cycle(range(len(engines)))
+        self._lock = threading.Lock()
+
+    def lag(self, index):
+        with self._lock:
+            measured = self._lag.get(index)
+        if measured is not None and time.monotonic() - measured[1] < self.check_interval:
+            return measured[0]
+
+        try:
+            lag = measure_lag(self.engines[index])
+        except exc.DBAPIError as e:
+            logger.warning('Read replica %d is unreachable: %s', index, e)
+            lag = None
+        with self._lock:
+            self._lag[index] = (lag, time.monotonic())
+        return lag
+
+    def healthy(self, index):
+        lag = self.lag(index)
+        return lag is not None and lag <= self.max_lag_seconds
+
+    # Returns a replica engine, or None when every replica is lagging or unreachable so the read uses the primary
+    def choose(self):
+        for _ in range(len(self.engines)):
+            with self._lock:
+                index = next(self._order)
+            if self.healthy(index):
+                return self.engines[index]
+        with self._lock:
+            self.fallbacks += 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            lags = {index: lag for index, (lag, _) in self._lag.items()}
+            fallbacks = self.fallbacks
+        return {
+            'replicas': len(self.engines),
+            'max_lag_seconds': self.max_lag_seconds,
+            'lag_seconds': [lags.get(index) for index in range(len(self.engines))],
+            'primary_fallbacks': fallbacks,
+        }
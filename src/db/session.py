@@ -0,0 +1,123 @@
+# session.py
+import logging
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from db.connection import (
+    DB_REPLICA_LAG_CHECK_INTERVAL,
+    DB_REPLICA_MAX_LAG_SECONDS,
+    SessionLocal,
+    engine,
+    replica_engines,
+)
+from db.replica import ReplicaRouter
+
+logger = logging.getLogger(__name__)
+
+replica_router = ReplicaRouter(replica_engines, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_LAG_CHECK_INTERVAL)
+
+# Cookie sent after a write so the same client keeps reading from the primary until the replicas have caught up
+READ_PRIMARY_COOKIE = 'db_read_primary'
+
+# Returns the session for the current request, created on first use
+# (the session only checks a connection out of the pool when it runs its first query)
+def get_db():
+    if 'db' not in g:
+        g.db = SessionLocal()
+    return g.db
+
+# Decorator passing the request's session to the view as its first argument
+def with_db(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        return f(get_db(), *args, **kwargs)
+    return decorated_function
+
+# Returns the session for a read-only request: a replica session when one is healthy, otherwise the primary one.
+# Reads stay on the primary after this request or, recently, this client wrote, or when asked for with
+# the "X-Read-Consistency: primary" header. The replica, or the primary when none is healthy, is chosen (and the
+# replicas' lag checked) once per request, later calls reuse that decision
+def get_read_db():
+    if 'read_db' in g:
+        return g.read_db
+    if not replica_router.engines or g.get('db_wrote') or _reads_from_primary():
+        return get_db()
+
+    if 'db_read_replica' not in g:
+        g.db_read_replica = replica_router.choose()
+    if g.db_read_replica is None:
+        return get_db()
+    g.read_db = SessionLocal(bind=g.db_read_replica)
+    g.db_replica_max_lag = replica_router.max_lag_seconds
+    return g.read_db
+
+def _reads_from_primary():
+    return (request.headers.get('X-Read-Consistency', '').lower() == 'primary'
+            or READ_PRIMARY_COOKIE in request.cookies)
+
+# Decorator passing a read-only session to the view as its first argument
+def with_read_db(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        return f(get_read_db(), *args, **kwargs)
+    return decorated_function
+
+# Remembers that the current request wrote, through a flush or an ORM insert/update/delete statement
+@event.listens_for(SessionLocal, 'after_flush')
+def _track_flush(session, flush_context):
+    if has_app_context():
+        g.db_wrote = True
+
+@event.listens_for(SessionLocal, 'do_orm_execute')
+def _track_write_statement(orm_execute_state):
+    if has_app_context() and (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        g.db_wrote = True
+
+# Pins a client that just wrote to the primary for as long as a replica may lag behind
+def _mark_read_primary(response):
+    if replica_router.engines and g.get('db_wrote'):
+        response.set_cookie(READ_PRIMARY_COOKIE, '1', max_age=int(replica_router.max_lag_seconds) + 1, httponly=True)
+    return response
+
+# Ends the request's session: commits if the request succeeded, rolls back otherwise, and always closes it
+# so its connection goes back to the pool
+def close_db(exception=None):
+    read_db = g.pop('read_db', None)
+    if read_db is not None:
+        read_db.close()
+    db = g.pop('db', None)
+    if db is not None:
+        try:
+            if exception is None and db.is_active:
+                db.commit()
+            else:
+                db.rollback()
+        finally:
+            db.close()
+    _check_for_leaks()
+
+# Counts connections checked out and returned while handling the current request, on the primary and the replicas
+def _track_checkout(dbapi_connection, connection_record, connection_proxy):
+    if has_app_context():
+        g.db_connections_held = g.get('db_connections_held', 0) + 1
+        g.db_endpoint = request.endpoint if has_request_context() else None
+
+def _track_checkin(dbapi_connection, connection_record):
+    if has_app_context():
+        g.db_connections_held = g.get('db_connections_held', 0) - 1
+
+for tracked_engine in [engine, *replica_engines]:
+    event.listen(tracked_engine, 'checkout', _track_checkout)
+    event.listen(tracked_engine, 'checkin', _track_checkin)
+
+# In debug mode, flags requests that end while still holding a pooled connection
+def _check_for_leaks():
+    held = g.pop('db_connections_held', 0)
+    endpoint = g.pop('db_endpoint', None)
+    if held > 0 and (current_app.debug or current_app.config.get('DB_LEAK_DETECTION')):
+        logger.error('Request to %s ended with %d database connection(s) still checked out', endpoint, held)
+
+# Registers the session teardown and the read-after-write cookie on the app
+def init_db(app):
+    app.after_request(_mark_read_primary)
+    app.teardown_appcontext(close_db)
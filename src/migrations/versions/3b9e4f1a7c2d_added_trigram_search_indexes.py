@@ -0,0 +1,50 @@
+"""added trigram search indexes
+
+Revision ID: 3b9e4f1a7c2d
+Revises: f37ac98bf7f5
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9e4f1a7c2d'
+down_revision: Union[str, None] = 'f37ac98bf7f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Search document expressions, must stay identical to the ones built by search_document() in the models
+SEARCH_DOCUMENTS = {
+    'ix_vehicles_search_trgm': ('vehicles', ['make', 'model', 'registration_number', 'status', 'fuel_type']),
+    'ix_drivers_search_trgm': ('drivers', ['name', 'license_number', 'email']),
+    'ix_maintenance_records_search_trgm': ('maintenance_records', ['maintenance_type', 'description', 'notes']),
+    'ix_routes_search_trgm': ('routes', ['origin', 'destination']),
+    'ix_trip_logs_search_trgm': ('trip_logs', ['status']),
+}
+
+
+def search_document_sql(columns):
+    return " || ' ' || ".join(f"coalesce(CAST({column} AS TEXT), '')" for column in columns)
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index_name, (table_name, columns) in SEARCH_DOCUMENTS.items():
+        op.execute(
+            f'CREATE INDEX {index_name} ON {table_name} '
+            f'USING gin (({search_document_sql(columns)}) gin_trgm_ops)'
+        )
+    # numeric search terms are OR'ed with vehicles.year, which needs its own index for a bitmap OR
+    op.create_index(op.f('ix_vehicles_year'), 'vehicles', ['year'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_vehicles_year'), table_name='vehicles')
+    for index_name, (table_name, columns) in SEARCH_DOCUMENTS.items():
+        op.drop_index(index_name, table_name=table_name)
+    # pg_trgm is left installed as other objects in the database may depend on it
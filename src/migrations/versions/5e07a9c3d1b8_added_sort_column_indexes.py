@@ -0,0 +1,43 @@
+"""added (sort column, primary key) indexes for search sorting
+
+Revision ID: 5e07a9c3d1b8
+Revises: 8c41d2e6b0f5
+Create Date: 2026-10-18 11:21:54.903417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e07a9c3d1b8'
+down_revision: Union[str, None] = '8c41d2e6b0f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# sortable columns per table (see sortable_columns on the models) and the primary key used as tiebreaker
+SORT_INDEXES = {
+    'vehicles': ('vehicle_id', ['make', 'model', 'year', 'mileage', 'status']),
+    'drivers': ('driver_id', ['name', 'license_number', 'email']),
+    'routes': ('route_id', ['origin', 'destination']),
+    'maintenance_records': ('maintenance_id', ['vehicle_id', 'maintenance_type', 'cost', 'maintenance_date']),
+    'trip_logs': ('trip_id', ['start_time', 'end_time', 'mileage_start', 'status']),
+}
+
+
+def upgrade() -> None:
+    for table_name, (pk_name, columns) in SORT_INDEXES.items():
+        for column in columns:
+            op.create_index(f'ix_{table_name}_{column}_{pk_name}', table_name, [column, pk_name], unique=False)
+    # (year, vehicle_id) serves the numeric year lookups the single column index was added for
+    op.drop_index('ix_vehicles_year', table_name='vehicles')
+
+
+def downgrade() -> None:
+    op.create_index('ix_vehicles_year', 'vehicles', ['year'], unique=False)
+    for table_name, (pk_name, columns) in SORT_INDEXES.items():
+        for column in columns:
+            op.drop_index(f'ix_{table_name}_{column}_{pk_name}', table_name=table_name)
@@ -0,0 +1,41 @@
+"""added full text search vectors to maintenance records and trip logs
+
+Revision ID: 8c41d2e6b0f5
+Revises: 3b9e4f1a7c2d
+Create Date: 2026-10-18 10:03:27.559310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d2e6b0f5'
+down_revision: Union[str, None] = '3b9e4f1a7c2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # stored generated columns are computed for existing rows when added and kept current by Postgres on writes
+    op.add_column('maintenance_records', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+        "setweight(to_tsvector('english', coalesce(description, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(notes, '')), 'B')",
+        persisted=True,
+    ), nullable=True))
+    op.create_index('ix_maintenance_records_search_vector', 'maintenance_records', ['search_vector'], unique=False, postgresql_using='gin')
+    op.add_column('trip_logs', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+        "to_tsvector('english', coalesce(notes, ''))",
+        persisted=True,
+    ), nullable=True))
+    op.create_index('ix_trip_logs_search_vector', 'trip_logs', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trip_logs_search_vector', table_name='trip_logs')
+    op.drop_column('trip_logs', 'search_vector')
+    op.drop_index('ix_maintenance_records_search_vector', table_name='maintenance_records')
+    op.drop_column('maintenance_records', 'search_vector')
@@ -0,0 +1,32 @@
+"""added updated_at indexes for conditional GET validators
+
+Revision ID: a1f3c5e7b9d2
+Revises: 5e07a9c3d1b8
+Create Date: 2026-10-18 14:02:11.408213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1f3c5e7b9d2'
+down_revision: Union[str, None] = '5e07a9c3d1b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# max(updated_at) per table validates cached search pages, the index answers it from a single index entry
+TABLES = ('vehicles', 'drivers', 'routes', 'maintenance_records', 'trip_logs')
+
+
+def upgrade() -> None:
+    for table_name in TABLES:
+        op.create_index(f'ix_{table_name}_updated_at', table_name, ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    for table_name in TABLES:
+        op.drop_index(f'ix_{table_name}_updated_at', table_name=table_name)
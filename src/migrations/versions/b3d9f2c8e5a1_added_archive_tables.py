@@ -0,0 +1,70 @@
+"""added archive tables for trip logs and maintenance records
+
+Revision ID: b3d9f2c8e5a1
+Revises: e4b8d1f6a3c9
+Create Date: 2026-10-18 17:24:05.630184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d9f2c8e5a1'
+down_revision: Union[str, None] = 'e4b8d1f6a3c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Schema holding one view per archived table under the table's own name, so a query run with
+# schema_translate_map={None: 'with_archive'} reads the hot and archived rows together (see services/archive_services.py)
+ARCHIVE_SCHEMA = 'with_archive'
+
+# table: (primary key, foreign keys, indexed columns); archived rows are only read by include_archived searches and
+# exports, so the archive tables get the time column used by the archiving cutoff and the foreign key indexes
+ARCHIVED_TABLES = {
+    'trip_logs': ('trip_id', {'vehicle_id': 'vehicles', 'driver_id': 'drivers', 'route_id': 'routes'}, ['start_time']),
+    'maintenance_records': ('maintenance_id', {'vehicle_id': 'vehicles', 'driver_id': 'drivers'}, ['maintenance_date']),
+}
+
+# Stored columns per table, search_vector is generated and recomputed on insert
+COLUMNS = {
+    'trip_logs': 'trip_id, vehicle_id, driver_id, route_id, start_time, end_time, mileage_start, mileage_end, status, '
+                 'notes, created_at, updated_at',
+    'maintenance_records': 'maintenance_id, vehicle_id, driver_id, maintenance_type, description, cost, maintenance_date, '
+                           'notes, created_at, updated_at',
+}
+
+
+def upgrade() -> None:
+    op.execute(f'CREATE SCHEMA {ARCHIVE_SCHEMA}')
+    for table_name, (pk_name, foreign_keys, indexed_columns) in ARCHIVED_TABLES.items():
+        archive_name = f'{table_name}_archive'
+        # same columns (in the same order, which the view's UNION ALL relies on) and generated search_vector, no
+        # defaults (rows arrive complete); archived rows are never updated, so pages are packed full
+        op.execute(
+            f'CREATE TABLE {archive_name} (LIKE {table_name} INCLUDING GENERATED, PRIMARY KEY ({pk_name})) '
+            'WITH (fillfactor = 100)'
+        )
+        for column, referenced_table in foreign_keys.items():
+            op.create_foreign_key(f'{archive_name}_{column}_fkey', archive_name, referenced_table, [column], [column])
+        for column in [*indexed_columns, *foreign_keys]:
+            op.create_index(f'ix_{archive_name}_{column}', archive_name, [column], unique=False)
+        # * is expanded when the view is created, a column added to the table later needs the view recreated
+        op.execute(
+            f'CREATE VIEW {ARCHIVE_SCHEMA}.{table_name} AS '
+            f'SELECT * FROM {table_name} UNION ALL SELECT * FROM {archive_name}'
+        )
+
+
+def downgrade() -> None:
+    # archived rows are moved back into the hot tables rather than lost
+    for table_name in ARCHIVED_TABLES:
+        archive_name = f'{table_name}_archive'
+        op.execute(f'DROP VIEW {ARCHIVE_SCHEMA}.{table_name}')
+        columns = COLUMNS[table_name]
+        op.execute(f'INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {archive_name}')
+        op.drop_table(archive_name)
+    op.execute(f'DROP SCHEMA {ARCHIVE_SCHEMA}')
@@ -0,0 +1,47 @@
+"""added foreign key, history and BRIN start_time indexes
+
+Revision ID: c7e2a9f4b1d6
+Revises: a1f3c5e7b9d2
+Create Date: 2026-10-18 15:10:37.552091
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2a9f4b1d6'
+down_revision: Union[str, None] = 'a1f3c5e7b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns, index method); the (parent, time, primary key) indexes serve the vehicle and driver
+# history endpoints and, through their leading column, the foreign key checks when a vehicle or driver is deleted
+INDEXES = [
+    ('ix_trip_logs_vehicle_id_start_time', 'trip_logs', ['vehicle_id', 'start_time', 'trip_id'], 'btree'),
+    ('ix_trip_logs_driver_id_start_time', 'trip_logs', ['driver_id', 'start_time', 'trip_id'], 'btree'),
+    ('ix_trip_logs_route_id', 'trip_logs', ['route_id'], 'btree'),
+    ('ix_trip_logs_start_time_brin', 'trip_logs', ['start_time'], 'brin'),
+    ('ix_maintenance_records_vehicle_id_maintenance_date', 'maintenance_records', ['vehicle_id', 'maintenance_date', 'maintenance_id'], 'btree'),
+    ('ix_maintenance_records_driver_id_maintenance_date', 'maintenance_records', ['driver_id', 'maintenance_date', 'maintenance_id'], 'btree'),
+    ('ix_drivers_assigned_vehicle_id', 'drivers', ['assigned_vehicle_id'], 'btree'),
+]
+
+
+# The tables are large and written continuously, so the indexes are built CONCURRENTLY (without blocking writes).
+# That cannot run inside a transaction, hence the autocommit block. A failed concurrent build leaves an INVALID index
+# behind, drop it before running the upgrade again
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns, method in INDEXES:
+            op.create_index(index_name, table_name, columns, unique=False,
+                            postgresql_using=method, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name, columns, method in reversed(INDEXES):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
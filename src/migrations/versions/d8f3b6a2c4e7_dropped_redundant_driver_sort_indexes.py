@@ -0,0 +1,36 @@
+"""dropped the (license_number, driver_id) and (email, driver_id) sort indexes
+
+Revision ID: d8f3b6a2c4e7
+Revises: f2a6c9d4e8b1
+Create Date: 2026-10-18 21:04:12.381954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f3b6a2c4e7'
+down_revision: Union[str, None] = 'f2a6c9d4e8b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# license_number and email are unique and not null, so sorting by them needs no driver_id tiebreaker and the unique
+# indexes serve both the ORDER BY and the keyset cursor; the (column, driver_id) indexes only slowed down writes
+REDUNDANT_INDEXES = [
+    ('ix_drivers_license_number_driver_id', ['license_number', 'driver_id']),
+    ('ix_drivers_email_driver_id', ['email', 'driver_id']),
+]
+
+
+def upgrade() -> None:
+    for index_name, columns in REDUNDANT_INDEXES:
+        op.drop_index(index_name, table_name='drivers')
+
+
+def downgrade() -> None:
+    for index_name, columns in REDUNDANT_INDEXES:
+        op.create_index(index_name, 'drivers', columns, unique=False)
@@ -0,0 +1,119 @@
+"""partitioned trip_logs by month on start_time
+
+Revision ID: e4b8d1f6a3c9
+Revises: c7e2a9f4b1d6
+Create Date: 2026-10-18 16:02:48.217530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8d1f6a3c9'
+down_revision: Union[str, None] = 'c7e2a9f4b1d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Months of partitions created ahead of the current one, scripts/create_trip_log_partitions.py keeps them coming
+MONTHS_AHEAD = 3
+
+# Stored columns copied between the old and new table (search_vector is generated and recomputed on insert)
+COLUMNS = ('trip_id, vehicle_id, driver_id, route_id, start_time, end_time, mileage_start, mileage_end, status, notes, '
+           'created_at, updated_at')
+
+FOREIGN_KEYS = {
+    'trip_logs_vehicle_id_fkey': ('vehicle_id', 'vehicles'),
+    'trip_logs_driver_id_fkey': ('driver_id', 'drivers'),
+    'trip_logs_route_id_fkey': ('route_id', 'routes'),
+}
+
+# Every index on trip_logs, recreated on the new table. On the partitioned table each one is created on every
+# partition, existing and future
+INDEXES = {
+    'ix_trip_logs_trip_id': 'btree (trip_id)',
+    'ix_trip_logs_start_time_trip_id': 'btree (start_time, trip_id)',
+    'ix_trip_logs_end_time_trip_id': 'btree (end_time, trip_id)',
+    'ix_trip_logs_mileage_start_trip_id': 'btree (mileage_start, trip_id)',
+    'ix_trip_logs_status_trip_id': 'btree (status, trip_id)',
+    'ix_trip_logs_search_trgm': "gin ((coalesce(CAST(status AS TEXT), '')) gin_trgm_ops)",
+    'ix_trip_logs_search_vector': 'gin (search_vector)',
+    'ix_trip_logs_updated_at': 'btree (updated_at)',
+    'ix_trip_logs_vehicle_id_start_time': 'btree (vehicle_id, start_time, trip_id)',
+    'ix_trip_logs_driver_id_start_time': 'btree (driver_id, start_time, trip_id)',
+    'ix_trip_logs_route_id': 'btree (route_id)',
+    'ix_trip_logs_start_time_brin': 'brin (start_time)',
+}
+
+# Creates the missing monthly partitions (trip_logs_YYYY_MM) between two months. Rows outside every partition land
+# in trip_logs_default, a month that already has rows there is skipped (with a notice) as Postgres would reject it
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_trip_log_partitions(from_month date, to_month date) RETURNS integer AS $$
+DECLARE
+    month date := date_trunc('month', from_month);
+    created integer := 0;
+    partition_name text;
+BEGIN
+    WHILE month <= to_month LOOP
+        partition_name := 'trip_logs_' || to_char(month, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM trip_logs_default WHERE start_time >= month AND start_time < month + interval '1 month') THEN
+                RAISE NOTICE 'trip_logs_default has rows for %, partition % not created', to_char(month, 'YYYY-MM'), partition_name;
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF trip_logs FOR VALUES FROM (%L) TO (%L)',
+                               partition_name, month, month + interval '1 month');
+                created := created + 1;
+            END IF;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def create_constraints_and_indexes(primary_key):
+    op.execute(f'ALTER TABLE trip_logs ADD CONSTRAINT trip_logs_pkey PRIMARY KEY ({primary_key})')
+    for name, (column, table_name) in FOREIGN_KEYS.items():
+        op.create_foreign_key(name, 'trip_logs', table_name, [column], [column])
+    for name, definition in INDEXES.items():
+        op.execute(f'CREATE INDEX {name} ON trip_logs USING {definition}')
+    op.execute('ANALYZE trip_logs')
+
+
+# The table is rebuilt: the old one is renamed, a partitioned copy with the same columns, defaults and generated
+# search_vector takes its name, the rows are copied across and the old table dropped. Constraints and indexes are
+# added once the rows are in, which is faster than maintaining them row by row. The table is locked for the copy
+def upgrade() -> None:
+    op.execute('ALTER TABLE trip_logs RENAME TO trip_logs_unpartitioned')
+    op.execute(
+        'CREATE TABLE trip_logs (LIKE trip_logs_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED) '
+        'PARTITION BY RANGE (start_time)'
+    )
+    op.execute('CREATE TABLE trip_logs_default PARTITION OF trip_logs DEFAULT')
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    op.execute(
+        "SELECT create_trip_log_partitions("
+        "CAST(coalesce((SELECT min(start_time) FROM trip_logs_unpartitioned), now()) AS date), "
+        f"CAST(now() + interval '{MONTHS_AHEAD} months' AS date))"
+    )
+    op.execute(f'INSERT INTO trip_logs ({COLUMNS}) SELECT {COLUMNS} FROM trip_logs_unpartitioned')
+    # the trip_id sequence belongs to the old table's column and would be dropped with it
+    op.execute('ALTER SEQUENCE trip_logs_trip_id_seq OWNED BY trip_logs.trip_id')
+    op.execute('DROP TABLE trip_logs_unpartitioned')
+    # the partition key has to be part of the primary key, trip_id alone stays unique through its sequence
+    create_constraints_and_indexes('trip_id, start_time')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE trip_logs RENAME TO trip_logs_partitioned')
+    op.execute('CREATE TABLE trip_logs (LIKE trip_logs_partitioned INCLUDING DEFAULTS INCLUDING GENERATED)')
+    op.execute(f'INSERT INTO trip_logs ({COLUMNS}) SELECT {COLUMNS} FROM trip_logs_partitioned')
+    op.execute('ALTER SEQUENCE trip_logs_trip_id_seq OWNED BY trip_logs.trip_id')
+    op.execute('DROP TABLE trip_logs_partitioned CASCADE')
+    op.execute('DROP FUNCTION create_trip_log_partitions(date, date)')
+    create_constraints_and_indexes('trip_id')
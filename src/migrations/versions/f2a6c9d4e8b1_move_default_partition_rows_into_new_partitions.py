@@ -0,0 +1,96 @@
+"""move default partition rows into newly created trip_logs partitions
+
+Revision ID: f2a6c9d4e8b1
+Revises: b3d9f2c8e5a1
+Create Date: 2026-10-18 19:12:40.518306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6c9d4e8b1'
+down_revision: Union[str, None] = 'b3d9f2c8e5a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Creates the missing monthly partitions (trip_logs_YYYY_MM) between two months. Postgres refuses a new partition
+# while the default partition holds rows for its range, so for such a month the default partition is detached, the
+# partition created, the month's rows moved into it and the default reattached, all in the caller's transaction
+# (trip_logs stays locked until it commits). The moved columns are read from the catalog, generated ones are
+# recomputed on insert
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_trip_log_partitions(from_month date, to_month date) RETURNS integer AS $$
+DECLARE
+    month date := date_trunc('month', from_month);
+    month_end date;
+    created integer := 0;
+    partition_name text;
+    stored_columns text;
+BEGIN
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO stored_columns
+    FROM pg_attribute
+    WHERE attrelid = CAST('trip_logs' AS regclass) AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+    WHILE month <= to_month LOOP
+        partition_name := 'trip_logs_' || to_char(month, 'YYYY_MM');
+        month_end := month + interval '1 month';
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM trip_logs_default WHERE start_time >= month AND start_time < month_end) THEN
+                ALTER TABLE trip_logs DETACH PARTITION trip_logs_default;
+                EXECUTE format('CREATE TABLE %I PARTITION OF trip_logs FOR VALUES FROM (%L) TO (%L)',
+                               partition_name, month, month_end);
+                EXECUTE format('WITH moved AS (DELETE FROM trip_logs_default WHERE start_time >= %L AND start_time < %L '
+                               'RETURNING %s) INSERT INTO trip_logs (%s) SELECT %s FROM moved',
+                               month, month_end, stored_columns, stored_columns, stored_columns);
+                ALTER TABLE trip_logs ATTACH PARTITION trip_logs_default DEFAULT;
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF trip_logs FOR VALUES FROM (%L) TO (%L)',
+                               partition_name, month, month_end);
+            END IF;
+            created := created + 1;
+        END IF;
+        month := month_end;
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# Previous version (migration e4b8d1f6a3c9), which skipped months with rows in the default partition
+SKIPPING_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_trip_log_partitions(from_month date, to_month date) RETURNS integer AS $$
+DECLARE
+    month date := date_trunc('month', from_month);
+    created integer := 0;
+    partition_name text;
+BEGIN
+    WHILE month <= to_month LOOP
+        partition_name := 'trip_logs_' || to_char(month, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM trip_logs_default WHERE start_time >= month AND start_time < month + interval '1 month') THEN
+                RAISE NOTICE 'trip_logs_default has rows for %, partition % not created', to_char(month, 'YYYY-MM'), partition_name;
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF trip_logs FOR VALUES FROM (%L) TO (%L)',
+                               partition_name, month, month + interval '1 month');
+                created := created + 1;
+            END IF;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute(SKIPPING_PARTITIONS_FUNCTION)
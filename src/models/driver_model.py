@@ -1,6 +1,8 @@
 from sqlalchemy import Column, Integer, String, Date, TIMESTAMP, ForeignKey
 from sqlalchemy.sql import func
 from db.connection import Base
+from utils.query_helpers import search_document, sort_indexes, trigram_index
+from utils.serialization import serialize_object
 
 # Class to build table for Drivers
 class Driver(Base):
@@ -12,20 +14,23 @@ class Driver(Base):
     license_expiry_date = Column(Date, nullable=False)
     phone_number = Column(String(20), nullable=False)
     email = Column(String(100), nullable=False, unique=True)
-    assigned_vehicle_id = Column(Integer, ForeignKey('vehicles.vehicle_id'), nullable=True)  # References vehicles table (foreign key)
+    assigned_vehicle_id = Column(Integer, ForeignKey('vehicles.vehicle_id'), nullable=True, index=True)  # References vehicles table (foreign key)
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+
+    # Columns search results can be sorted by, name backed by a (name, driver_id) index and the unique license_number
+    # and email by their unique indexes
+    sortable_columns = ('driver_id', 'name', 'license_number', 'email')
+
+    __table_args__ = sort_indexes('drivers', 'driver_id', sortable_columns, unique_columns=('license_number', 'email'))
+
+    # Server defaults (IDs and timestamps) come back with the INSERT/UPDATE through RETURNING instead of a refresh
+    __mapper_args__ = {'eager_defaults': True}
 
     # Method to convert SQL entry into a dictionary
     def to_dict(self):
-        return {
-            "driver_id": self.driver_id,
-            "name": self.name,
-            "license_number": self.license_number,
-            "license_expiry_date": self.license_expiry_date,
-            "phone_number": self.phone_number,
-            "email": self.email,
-            "assigned_vehicle_id": self.assigned_vehicle_id,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-        }
\ No newline at end of file
+        return serialize_object(self)
+
+# Combined text of the searchable columns, served by a GIN trigram index
+DRIVER_SEARCH_DOCUMENT = search_document(Driver.name, Driver.license_number, Driver.email)
+trigram_index(Driver, 'ix_drivers_search_trgm', DRIVER_SEARCH_DOCUMENT)
@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, Date, DECIMAL, TIMESTAMP, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Date, DECIMAL, TIMESTAMP, ForeignKey, Text, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from db.connection import Base
+from utils.query_helpers import search_document, sort_indexes, trigram_index
+from utils.serialization import serialize_object
 from datetime import datetime
 
 # Class to build table for Maintenance Records
@@ -16,19 +19,33 @@ class MaintenanceRecord(Base):
     maintenance_date = Column(Date, nullable=False)
     notes = Column(Text, nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+    # Full-text search vector generated by Postgres on every write, descriptions weigh more than notes
+    # (left unmapped so it is never loaded or returned by writes, queries use MaintenanceRecord.__table__.c.search_vector)
+    search_vector = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(description, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(notes, '')), 'B')",
+        persisted=True,
+    ))
+
+    # Columns search results can be sorted by, each backed by a (column, maintenance_id) index
+    sortable_columns = ('maintenance_id', 'vehicle_id', 'maintenance_type', 'cost', 'maintenance_date')
+
+    __table_args__ = (
+        *sort_indexes('maintenance_records', 'maintenance_id', sortable_columns),
+        Index('ix_maintenance_records_search_vector', 'search_vector', postgresql_using='gin'),
+        # Vehicle and driver maintenance histories (newest first), these also serve the foreign key checks on deletes
+        Index('ix_maintenance_records_vehicle_id_maintenance_date', 'vehicle_id', 'maintenance_date', 'maintenance_id'),
+        Index('ix_maintenance_records_driver_id_maintenance_date', 'driver_id', 'maintenance_date', 'maintenance_id'),
+    )
+
+    # Server defaults (IDs and timestamps) come back with the INSERT/UPDATE through RETURNING instead of a refresh
+    __mapper_args__ = {'eager_defaults': True, 'exclude_properties': ['search_vector']}
 
     # Method to convert SQL entry into a dictionary
     def to_dict(self):
-        return {
-            "maintenance_id": self.maintenance_id,
-            "vehicle_id": self.vehicle_id,
-            "driver_id": self.driver_id,
-            "maintenance_type": self.maintenance_type,
-            "description": self.description,
-            "cost": self.cost,
-            "maintenance_date": self.maintenance_date.strftime('%Y-%m-%d') if self.maintenance_date else None,
-            "notes": self.notes,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-        }
\ No newline at end of file
+        return serialize_object(self)
+
+# Combined text of the searchable columns, served by a GIN trigram index
+MAINTENANCE_SEARCH_DOCUMENT = search_document(MaintenanceRecord.maintenance_type, MaintenanceRecord.description, MaintenanceRecord.notes)
+trigram_index(MaintenanceRecord, 'ix_maintenance_records_search_trgm', MAINTENANCE_SEARCH_DOCUMENT)
@@ -1,6 +1,8 @@
 from sqlalchemy import Column, Integer, String, Float, TIMESTAMP
 from sqlalchemy.sql import func
 from db.connection import Base
+from utils.query_helpers import search_document, sort_indexes, trigram_index
+from utils.serialization import serialize_object
 
 # Class to build table for Routes
 class Route(Base):
@@ -12,16 +14,20 @@ class Route(Base):
     distance = Column(Float, nullable=False)
     estimated_duration = Column(Integer, nullable=False)  # Assuming it's in minutes
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+
+    # Columns search results can be sorted by, each backed by a (column, route_id) index
+    sortable_columns = ('route_id', 'origin', 'destination')
+
+    __table_args__ = sort_indexes('routes', 'route_id', sortable_columns)
+
+    # Server defaults (IDs and timestamps) come back with the INSERT/UPDATE through RETURNING instead of a refresh
+    __mapper_args__ = {'eager_defaults': True}
 
     # Method to convert SQL entry into a dictionary
     def to_dict(self):
-        return {
-            "route_id": self.route_id,
-            "origin": self.origin,
-            "destination": self.destination,
-            "distance": self.distance,
-            "estimated_duration": self.estimated_duration,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-        }
\ No newline at end of file
+        return serialize_object(self)
+
+# Combined text of the searchable columns, served by a GIN trigram index
+ROUTE_SEARCH_DOCUMENT = search_document(Route.origin, Route.destination)
+trigram_index(Route, 'ix_routes_search_trgm', ROUTE_SEARCH_DOCUMENT)
@@ -1,35 +1,51 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Text, Float, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from db.connection import Base
+from utils.query_helpers import search_document, sort_indexes, trigram_index
+from utils.serialization import serialize_object
 
+# Trip logs are range partitioned by month on start_time (see db/partitions.py), so the table's primary key is
+# (trip_id, start_time) while trip_id alone identifies a trip to the ORM
 class TripLog(Base):
     __tablename__ = 'trip_logs'
 
-    trip_id = Column(Integer, primary_key=True, index=True)
+    trip_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     vehicle_id = Column(Integer, ForeignKey('vehicles.vehicle_id'), nullable=False)
     driver_id = Column(Integer, ForeignKey('drivers.driver_id'), nullable=False)
-    route_id = Column(Integer, ForeignKey('routes.route_id'), nullable=False)
-    start_time = Column(TIMESTAMP, nullable=False)
+    route_id = Column(Integer, ForeignKey('routes.route_id'), nullable=False, index=True)
+    start_time = Column(TIMESTAMP, primary_key=True, nullable=False)
     end_time = Column(TIMESTAMP)
     mileage_start = Column(Integer, nullable=False)
     mileage_end = Column(Integer)
     status = Column(String(20), nullable=False)
     notes = Column(Text)
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+    # Full-text search vector over the notes, generated by Postgres on every write
+    # (left unmapped so it is never loaded or returned by writes, queries use TripLog.__table__.c.search_vector)
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('english', coalesce(notes, ''))", persisted=True))
+
+    # Columns search results can be sorted by, each backed by a (column, trip_id) index
+    sortable_columns = ('trip_id', 'start_time', 'end_time', 'mileage_start', 'status')
+
+    __table_args__ = (
+        *sort_indexes('trip_logs', 'trip_id', sortable_columns),
+        Index('ix_trip_logs_search_vector', 'search_vector', postgresql_using='gin'),
+        # Vehicle and driver trip histories (newest first), these also serve the foreign key checks on deletes
+        Index('ix_trip_logs_vehicle_id_start_time', 'vehicle_id', 'start_time', 'trip_id'),
+        Index('ix_trip_logs_driver_id_start_time', 'driver_id', 'start_time', 'trip_id'),
+        # Trips are written roughly in start_time order, a BRIN index serves time range scans at a fraction of the size
+        Index('ix_trip_logs_start_time_brin', 'start_time', postgresql_using='brin'),
+        {'postgresql_partition_by': 'RANGE (start_time)'},
+    )
+
+    # Server defaults (IDs and timestamps) come back with the INSERT/UPDATE through RETURNING instead of a refresh
+    __mapper_args__ = {'eager_defaults': True, 'exclude_properties': ['search_vector'], 'primary_key': [trip_id]}
 
     def to_dict(self):
-        return {
-            'trip_id': self.trip_id,
-            'vehicle_id': self.vehicle_id,
-            'driver_id': self.driver_id,
-            'route_id': self.route_id,
-            'start_time': self.start_time,
-            'end_time': self.end_time,
-            'mileage_start': self.mileage_start,
-            'mileage_end': self.mileage_end,
-            'status': self.status,
-            'notes': self.notes,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at,
-        }
\ No newline at end of file
+        return serialize_object(self)
+
+# Combined text of the searchable columns, served by a GIN trigram index
+TRIP_LOG_SEARCH_DOCUMENT = search_document(TripLog.status)
+trigram_index(TripLog, 'ix_trip_logs_search_trgm', TRIP_LOG_SEARCH_DOCUMENT)
@@ -1,6 +1,8 @@
 from sqlalchemy import Column, Integer, String, TIMESTAMP
 from sqlalchemy.sql import func
 from db.connection import Base
+from utils.query_helpers import search_document, sort_indexes, trigram_index
+from utils.serialization import serialize_object
 
 # Class to build table for Vehicles
 class Vehicle(Base):
@@ -15,19 +17,20 @@ class Vehicle(Base):
     mileage = Column(Integer, nullable=False)
     fuel_type = Column(String(20), nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False) # sets time automatically
-    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False) # updates time automatically
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False, index=True) # updates time automatically
+
+    # Columns search results can be sorted by, each backed by a (column, vehicle_id) index
+    sortable_columns = ('vehicle_id', 'make', 'model', 'year', 'mileage', 'status')
+
+    __table_args__ = sort_indexes('vehicles', 'vehicle_id', sortable_columns)
+
+    # Server defaults (IDs and timestamps) come back with the INSERT/UPDATE through RETURNING instead of a refresh
+    __mapper_args__ = {'eager_defaults': True}
 
     # method to convert sql entry into python dict
     def to_dict(self):
-        return {
-            "vehicle_id": self.vehicle_id,
-            "make": self.make,
-            "model": self.model,
-            "year": self.year,
-            "registration_number": self.registration_number,
-            "status": self.status,
-            "mileage": self.mileage,
-            "fuel_type": self.fuel_type,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-        }
\ No newline at end of file
+        return serialize_object(self)
+
+# Combined text of the searchable columns, served by a GIN trigram index
+VEHICLE_SEARCH_DOCUMENT = search_document(Vehicle.make, Vehicle.model, Vehicle.registration_number, Vehicle.status, Vehicle.fuel_type)
+trigram_index(Vehicle, 'ix_vehicles_search_trgm', VEHICLE_SEARCH_DOCUMENT)
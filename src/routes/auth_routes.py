@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify, render_template
 from flask_jwt_extended import create_access_token, jwt_required
-from db.connection import SessionLocal
+from db.session import with_db
 from models.user_model import User
 
 auth_bp = Blueprint('auth', __name__)
@@ -12,20 +12,17 @@ def register_form():
 
 # Register a new user
 @auth_bp.route('/register', methods=['POST'])
-def register():
-    db = SessionLocal()
-    try:
-        # Check if users exist in the database
-        user_count = db.query(User).count()
+@with_db
+def register(db):
+    # Check if users exist in the database
+    user_count = db.query(User).count()
 
-        # If no users exist, allow the first user to register without requiring JWT
-        if user_count == 0:
-            return register_first_user(db)
+    # If no users exist, allow the first user to register without requiring JWT
+    if user_count == 0:
+        return register_first_user(db)
 
-        # For subsequent registrations, enforce JWT authentication
-        return register_with_jwt(db)
-    finally:
-        db.close()
+    # For subsequent registrations, enforce JWT authentication
+    return register_with_jwt(db)
 
 # Helper function for the first user registration (without JWT)
 def register_first_user(db):
@@ -75,26 +72,23 @@ def register_with_jwt(db):
 
 # Login a user and generate a JWT
 @auth_bp.route('/login', methods=['GET', 'POST'])
-def login():
+@with_db
+def login(db):
     if request.method == 'GET':
         # Render the login page for GET requests
         return render_template('login.html')
 
     elif request.method == 'POST':
         # Handle login logic for POST requests
-        db = SessionLocal()
-        try:
-            data = request.get_json()
-            username = data.get('username')
-            password = data.get('password')
-
-            user = db.query(User).filter_by(username=username).first()
-
-            if user is None or not user.check_pass(password):
-                return jsonify({"error": "Invalid credentials"}), 401
-
-            # Create a new access token
-            access_token = create_access_token(identity={'username': user.username, 'role': user.role})
-            return jsonify(access_token=access_token), 200
-        finally:
-            db.close()
\ No newline at end of file
+        data = request.get_json()
+        username = data.get('username')
+        password = data.get('password')
+
+        user = db.query(User).filter_by(username=username).first()
+
+        if user is None or not user.check_pass(password):
+            return jsonify({"error": "Invalid credentials"}), 401
+
+        # Create a new access token
+        access_token = create_access_token(identity={'username': user.username, 'role': user.role})
+        return jsonify(access_token=access_token), 200
\ No newline at end of file
@@ -1,10 +1,12 @@
-from contextlib import closing
-from functools import wraps
 from flask import Blueprint, render_template, request, jsonify
 from flask_jwt_extended import jwt_required
-from sqlalchemy import String, or_, asc, desc
-from db.connection import SessionLocal
-from models.driver_model import Driver
+from sqlalchemy import String, or_
+from db.session import with_db, with_read_db
+from models.driver_model import Driver, DRIVER_SEARCH_DOCUMENT
+from utils.query_helpers import apply_sorting_query, build_filter_query, get_row, keyset_paginate, paginate, parse_fields, parse_filter_params, project_columns, rows_to_dicts, validate_search_mode, validate_sorting
+from utils.export import requested_export_format, stream_export
+from utils.conditional import conditional_row, conditional_table
+from utils.cache import cached
 from services.driver_services import (
     create_driver,
     get_driver,
@@ -15,22 +17,6 @@ from services.driver_services import (
 # declares Blueprint for driver routes
 driver_bp = Blueprint('driver', __name__)
 
-# Helper function to fetch the DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# fetches the DB session with a decorator
-def with_db(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        with closing(next(get_db())) as db:
-            return f(db, *args, **kwargs)
-    return decorated_function
-
 # Helper function to handle "Driver not found" case
 def not_found(driver):
     if not driver:
@@ -70,22 +56,30 @@ def create_driver_endpoint(db):
 
 # returns a driver by ID
 @driver_bp.route('/drivers/<int:driver_id>', methods=['GET'])
-@with_db
+@with_read_db
 @jwt_required()
+@conditional_row(Driver)
+@cached('drivers')
 def get_driver_by_id_endpoint(db, driver_id):
-    driver = get_driver(db, driver_id=driver_id)
-    return not_found(driver) or jsonify(driver.to_dict())  # Simplify the logic
+    # "fields" selects a sparse fieldset, only those columns are read
+    try:
+        fields = parse_fields(Driver, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    driver = get_row(db, Driver, driver_id, fields)
+    return not_found(driver) or jsonify(driver)  # Simplify the logic
 
-# more accessible search, filtering, sorting, and table display of rows with pagination
-@driver_bp.route('/drivers/search', methods=['GET'])
-@with_db
-def search_drivers(db):
+# Builds the driver search query from the request's query, filter and sort parameters, shared by
+# search and export. Raises ValueError for invalid parameters
+def build_driver_search_query(db):
     search_term = request.args.get('query', '')
-    sort_by = request.args.get('sortBy', 'name')  # Default sort by name
+    sort_by = request.args.get('sortBy') or 'name'  # Default sort by name
     sort_order = request.args.get('sortOrder', 'asc')  # Default order ascending
+    search_mode = request.args.get('mode', 'substring')  # no search vector, substring matching only
 
-    # List of attributes to search for string fields
-    search_fields = [Driver.name, Driver.license_number, Driver.email]
+    # Reject unknown sort columns and search modes before touching the database
+    validate_sorting(Driver, sort_by, sort_order)
+    validate_search_mode(search_mode, modes=('substring',))
 
     query = db.query(Driver)
 
@@ -97,40 +91,93 @@ def search_drivers(db):
         if search_term.isdigit():
             search_filters.append(Driver.driver_id == int(search_term))
 
-        # Apply ILIKE to string fields
-        for field in search_fields:
-            search_filters.append(field.ilike(f"%{search_term}%"))
+        # Match the combined search document so the trigram index can serve the ILIKE
+        search_filters.append(DRIVER_SEARCH_DOCUMENT.ilike(f"%{search_term}%"))
         
         query = query.filter(or_(*search_filters))
 
-    # Apply sorting
-    if sort_order == 'asc':
-        query = query.order_by(asc(getattr(Driver, sort_by)))
-    else:
-        query = query.order_by(desc(getattr(Driver, sort_by)))
+    # Structured filters (equality, IN lists, ranges and null checks) narrow the results further
+    query = build_filter_query(query, parse_filter_params(request.args.get('filter')), Driver)
+
+    return query, sort_by, sort_order
+
+# more accessible search, filtering, sorting, and table display of rows with pagination
+@driver_bp.route('/drivers/search', methods=['GET'])
+@with_read_db
+@conditional_table(Driver, 'drivers')
+@cached('drivers')
+def search_drivers(db):
+    # Search term, structured filters and sorting from the request, invalid parameters are rejected before touching the database
+    try:
+        query, sort_by, sort_order = build_driver_search_query(db)
+        fields = parse_fields(Driver, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Plain column rows are serialized straight into the response, no ORM objects are built. A sparse
+    # fieldset ("fields") only reads the requested columns, plus the ones the cursor needs
+    query = project_columns(query, Driver, fields, required=(sort_by,))
+
+    # Cursor (keyset) pagination seeks past the last seen row instead of skipping pages
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        per_page = request.args.get('per_page', 10, type=int)
+        try:
+            drivers, next_cursor = keyset_paginate(query, Driver, sort_by, sort_order, cursor, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'drivers': rows_to_dicts(drivers, Driver, fields)
+        })
+
+    # Apply sorting with the primary key as a deterministic tiebreaker
+    query = apply_sorting_query(query, sort_by, sort_order, Driver)
 
     # Get pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    skip = (page - 1) * per_page
+    count_strategy = request.args.get('count', 'exact')
 
-    drivers = query.offset(skip).limit(per_page).all()
-    total_drivers = query.count()
+    # Fetch the page and its total with the requested count strategy (exact, estimated, capped or has_more)
+    try:
+        drivers, total_drivers, has_more = paginate(db, query, Driver, page, per_page, count_strategy)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({
         'page': page,
         'per_page': per_page,
         'total_drivers': total_drivers,
-        'drivers': [driver.to_dict() for driver in drivers]
+        'has_more': has_more,
+        'drivers': rows_to_dicts(drivers, Driver, fields)
     })
 
+# streams every matching driver as CSV, NDJSON, Arrow or Parquet ("format" or the Accept header), taking the same
+# query, filter and sort parameters as search
+@driver_bp.route('/drivers/export', methods=['GET'])
+@with_read_db
+@jwt_required()
+def export_drivers(db):
+    try:
+        query, sort_by, sort_order = build_driver_search_query(db)
+        fields = parse_fields(Driver, request.args.get('fields'))
+        query = apply_sorting_query(query, sort_by, sort_order, Driver)
+        return stream_export(query, Driver, requested_export_format(), 'drivers', fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 # updates a driver's details (supports partial updates)
 @driver_bp.route('/drivers/<int:driver_id>', methods=['PUT'])
 @with_db
 @jwt_required()
 def update_driver_endpoint(db, driver_id):
     data = request.get_json()
-    updated_driver = update_driver(db, driver_id=driver_id, data=data)
+    try:
+        updated_driver = update_driver(db, driver_id=driver_id, data=data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return not_found(updated_driver) or jsonify(updated_driver.to_dict())
 
 # deletes a driver
@@ -1,12 +1,17 @@
-import contextlib
-from functools import wraps
 from flask import Blueprint, render_template, request, jsonify
 from flask_jwt_extended import jwt_required
-from sqlalchemy import or_, String, asc, desc
-from db.connection import SessionLocal
-from models.m_records_model import MaintenanceRecord
+from sqlalchemy import or_, String
+from db.session import with_db, with_read_db
+from models.m_records_model import MaintenanceRecord, MAINTENANCE_SEARCH_DOCUMENT
+from utils.query_helpers import apply_fulltext_search, apply_sorting_query, apply_time_range, build_filter_query, get_row, keyset_paginate, paginate, parse_fields, parse_filter_params, project_columns, rows_to_dicts, validate_search_mode, validate_sorting
+from utils.bulk import bulk_status, parse_bulk_items
+from utils.export import requested_export_format, stream_export
+from utils.conditional import conditional_row, conditional_table
+from utils.cache import cached
+from services.archive_services import include_archived
 from services.m_records_services import (
     create_maintenance_record,
+    create_maintenance_records_bulk,
     get_maintenance_record,
     update_maintenance_record,
     delete_maintenance_record
@@ -15,22 +20,6 @@ from services.m_records_services import (
 # declares Blueprint for maintenance record routes
 maintenance_bp = Blueprint('maintenance', __name__)
 
-# Helper function to fetch the DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# fetches the DB session with a decorator
-def with_db(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        with contextlib.closing(next(get_db())) as db:
-            return f(db, *args, **kwargs)
-    return decorated_function
-
 # General helper function to handle "Not found" cases
 def not_found(entity, entity_name="Entity"):
     if not entity:
@@ -67,13 +56,32 @@ def create_maintenance_record_endpoint(db):
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+# creates many maintenance records from a JSON array or NDJSON body, reporting a result per item
+@maintenance_bp.route('/maintenance/bulk', methods=['POST'])
+@with_db
+@jwt_required()
+def create_maintenance_records_bulk_endpoint(db):
+    try:
+        items = parse_bulk_items()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    results = create_maintenance_records_bulk(db, items)
+    return jsonify({'results': results}), bulk_status(results)
+
 # returns a maintenance record by ID
 @maintenance_bp.route('/maintenance/<int:record_id>', methods=['GET'])
-@with_db
+@with_read_db
 @jwt_required()
+@conditional_row(MaintenanceRecord)
+@cached('maintenance_records')
 def get_maintenance_record_by_id_endpoint(db, record_id):
-    record = get_maintenance_record(db, record_id=record_id)
-    return not_found(record, "Maintenance Record") or jsonify(record.to_dict())
+    # "fields" selects a sparse fieldset, only those columns are read
+    try:
+        fields = parse_fields(MaintenanceRecord, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    record = get_row(db, MaintenanceRecord, record_id, fields)
+    return not_found(record, "Maintenance Record") or jsonify(record)
 
 # updates a maintenance record's details (supports partial updates)
 @maintenance_bp.route('/maintenance/<int:record_id>', methods=['PUT'])
@@ -81,7 +89,10 @@ def get_maintenance_record_by_id_endpoint(db, record_id):
 @jwt_required()
 def update_maintenance_record_endpoint(db, record_id):
     data = request.get_json()
-    updated_record = update_maintenance_record(db, record_id=record_id, data=data)
+    try:
+        updated_record = update_maintenance_record(db, record_id=record_id, data=data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return not_found(updated_record, "Maintenance Record") or jsonify(updated_record.to_dict())
 
 # deletes a maintenance record
@@ -92,50 +103,152 @@ def delete_maintenance_record_endpoint(db, record_id):
     deleted_record = delete_maintenance_record(db, record_id=record_id)
     return not_found(deleted_record, "Maintenance Record") or jsonify({'message': 'Maintenance record deleted successfully'})
 
-# more accessible search, filtering, sorting, and table display of rows with pagination
-@maintenance_bp.route('/maintenance/search', methods=['GET'])
-@with_db
-def search_maintenance_records(db):
+# Builds the maintenance record search query from the request's query, filter and sort parameters, shared by
+# search and export. Raises ValueError for invalid parameters
+def build_maintenance_record_search_query(db):
     search_term = request.args.get('query', '')
-    sort_by = request.args.get('sortBy', 'maintenance_type')  # Default sort by maintenance_type
+    sort_by = request.args.get('sortBy') or 'maintenance_type'  # Default sort by maintenance_type
     sort_order = request.args.get('sortOrder', 'asc')  # Default order ascending
+    search_mode = request.args.get('mode', 'substring')  # 'fulltext' searches the indexed search vector
 
-    # List of attributes to search for string fields
-    search_fields = [MaintenanceRecord.maintenance_type, MaintenanceRecord.description, MaintenanceRecord.notes]
+    # Reject unknown sort columns and search modes before touching the database
+    validate_sorting(MaintenanceRecord, sort_by, sort_order)
+    validate_search_mode(search_mode)
 
     query = db.query(MaintenanceRecord)
+    rank = None
+
+    # Full-text mode matches whole words, "phrases" and prefix* terms and ranks results by relevance
+    if search_term and search_mode == 'fulltext':
+        query, rank = apply_fulltext_search(query, MaintenanceRecord.__table__.c.search_vector, search_term)
 
     # Search for the term in all specified fields
-    if search_term:
+    elif search_term:
         search_filters = []
 
         # Check if search_term is numeric to filter by maintenance_id
         if search_term.isdigit():
             search_filters.append(MaintenanceRecord.maintenance_id == int(search_term))
 
-        # Apply ILIKE to string fields
-        for field in search_fields:
-            search_filters.append(field.ilike(f"%{search_term}%"))
+        # Match the combined search document so the trigram index can serve the ILIKE
+        search_filters.append(MAINTENANCE_SEARCH_DOCUMENT.ilike(f"%{search_term}%"))
         
         query = query.filter(or_(*search_filters))
 
-    # Apply sorting
-    if sort_order == 'asc':
-        query = query.order_by(asc(getattr(MaintenanceRecord, sort_by)))
+    # Structured filters (equality, IN lists, ranges and null checks) narrow the results further
+    query = build_filter_query(query, parse_filter_params(request.args.get('filter')), MaintenanceRecord)
+
+    # include_archived=true also searches the rows moved to the archive table
+    if request.args.get('include_archived', 'false').lower() == 'true':
+        query = include_archived(query)
+
+    return query, rank, sort_by, sort_order
+
+# more accessible search, filtering, sorting, and table display of rows with pagination
+@maintenance_bp.route('/maintenance/search', methods=['GET'])
+@with_read_db
+@conditional_table(MaintenanceRecord, 'maintenance_records')
+@cached('maintenance_records')
+def search_maintenance_records(db):
+    # Search term, structured filters and sorting from the request, invalid parameters are rejected before touching the database
+    try:
+        query, rank, sort_by, sort_order = build_maintenance_record_search_query(db)
+        fields = parse_fields(MaintenanceRecord, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Plain column rows are serialized straight into the response, no ORM objects are built. A sparse
+    # fieldset ("fields") only reads the requested columns, plus the ones the cursor needs
+    query = project_columns(query, MaintenanceRecord, fields, required=(sort_by,))
+
+    # Cursor (keyset) pagination seeks past the last seen row instead of skipping pages
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        if rank is not None:
+            return jsonify({'error': 'Cursor pagination is not supported for full-text search.'}), 400
+        per_page = request.args.get('per_page', 10, type=int)
+        try:
+            records, next_cursor = keyset_paginate(query, MaintenanceRecord, sort_by, sort_order, cursor, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'records': rows_to_dicts(records, MaintenanceRecord, fields)
+        })
+
+    # Apply sorting with the primary key as a deterministic tiebreaker (full-text results are ordered by relevance)
+    if rank is not None:
+        query = query.order_by(rank.desc(), MaintenanceRecord.maintenance_id)
     else:
-        query = query.order_by(desc(getattr(MaintenanceRecord, sort_by)))
+        query = apply_sorting_query(query, sort_by, sort_order, MaintenanceRecord)
 
     # Get pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    skip = (page - 1) * per_page
+    count_strategy = request.args.get('count', 'estimated')  # Large table, never counted in full by default
 
-    records = query.offset(skip).limit(per_page).all()
-    total_records = query.count()
+    # Fetch the page and its total with the requested count strategy (exact, estimated, capped or has_more)
+    try:
+        records, total_records, has_more = paginate(db, query, MaintenanceRecord, page, per_page, count_strategy)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({
         'page': page,
         'per_page': per_page,
         'total_records': total_records,
-        'records': [record.to_dict() for record in records]
+        'has_more': has_more,
+        'records': rows_to_dicts(records, MaintenanceRecord, fields)
+    })
+
+# streams every matching maintenance record as CSV, NDJSON, Arrow or Parquet ("format" or the Accept header), taking the same
+# query, filter and sort parameters as search
+@maintenance_bp.route('/maintenance/export', methods=['GET'])
+@with_read_db
+@jwt_required()
+def export_maintenance_records(db):
+    try:
+        query, rank, sort_by, sort_order = build_maintenance_record_search_query(db)
+        fields = parse_fields(MaintenanceRecord, request.args.get('fields'))
+        if rank is not None:
+            query = query.order_by(rank.desc(), MaintenanceRecord.maintenance_id)
+        else:
+            query = apply_sorting_query(query, sort_by, sort_order, MaintenanceRecord)
+        return stream_export(query, MaintenanceRecord, requested_export_format(), 'maintenance', fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# One page of a vehicle's or driver's maintenance records, newest first, optionally limited to a maintenance_date range
+# ("from", "to"). The (vehicle_id / driver_id, maintenance_date, maintenance_id) index is walked backwards from the cursor
+def maintenance_history(db, owner_column, owner_id):
+    try:
+        fields = parse_fields(MaintenanceRecord, request.args.get('fields'))
+        query = db.query(MaintenanceRecord).filter(owner_column == owner_id)
+        query = apply_time_range(query, MaintenanceRecord.maintenance_date, request.args.get('from'), request.args.get('to'))
+        query = project_columns(query, MaintenanceRecord, fields, required=('maintenance_date',))
+        per_page = request.args.get('per_page', 10, type=int)
+        records, next_cursor = keyset_paginate(query, MaintenanceRecord, 'maintenance_date', 'desc', request.args.get('cursor'), per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'records': rows_to_dicts(records, MaintenanceRecord, fields)
     })
+
+# Maintenance history of a vehicle
+@maintenance_bp.route('/vehicles/<int:vehicle_id>/maintenance', methods=['GET'])
+@with_read_db
+@jwt_required()
+@cached('maintenance_records')
+def get_vehicle_maintenance_records(db, vehicle_id):
+    return maintenance_history(db, MaintenanceRecord.vehicle_id, vehicle_id)
+
+# Maintenance history of a driver
+@maintenance_bp.route('/drivers/<int:driver_id>/maintenance', methods=['GET'])
+@with_read_db
+@jwt_required()
+@cached('maintenance_records')
+def get_driver_maintenance_records(db, driver_id):
+    return maintenance_history(db, MaintenanceRecord.driver_id, driver_id)
\ No newline at end of file
@@ -1,10 +1,12 @@
-import contextlib
-from functools import wraps
 from flask import Blueprint, render_template, request, jsonify
 from flask_jwt_extended import jwt_required
-from sqlalchemy import or_, String, asc, desc
-from db.connection import SessionLocal
-from models.routes_model import Route
+from sqlalchemy import or_, String
+from db.session import with_db, with_read_db
+from models.routes_model import Route, ROUTE_SEARCH_DOCUMENT
+from utils.query_helpers import apply_sorting_query, build_filter_query, get_row, keyset_paginate, paginate, parse_fields, parse_filter_params, project_columns, rows_to_dicts, validate_search_mode, validate_sorting
+from utils.export import requested_export_format, stream_export
+from utils.conditional import conditional_row, conditional_table
+from utils.cache import cached
 from services.routes_services import (
     create_route,
     get_route,
@@ -15,22 +17,6 @@ from services.routes_services import (
 # declares Blueprint for route routes
 route_bp = Blueprint('route', __name__)
 
-# Helper function to fetch the DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# fetches the DB session with a decorator
-def with_db(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        with contextlib.closing(next(get_db())) as db:
-            return f(db, *args, **kwargs)
-    return decorated_function
-
 # General helper function to handle "Not found" cases for any entity
 def not_found(entity, entity_name="Entity"):
     if not entity:
@@ -67,11 +53,18 @@ def create_route_endpoint(db):
 
 # returns a route by ID
 @route_bp.route('/routes/<int:route_id>', methods=['GET'])
-@with_db
+@with_read_db
 @jwt_required()
+@conditional_row(Route)
+@cached('routes')
 def get_route_by_id_endpoint(db, route_id):
-    route = get_route(db, route_id=route_id)
-    return not_found(route, "Route") or jsonify(route.to_dict())
+    # "fields" selects a sparse fieldset, only those columns are read
+    try:
+        fields = parse_fields(Route, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    route = get_row(db, Route, route_id, fields)
+    return not_found(route, "Route") or jsonify(route)
 
 # updates a route's details (supports partial updates)
 @route_bp.route('/routes/<int:route_id>', methods=['PUT'])
@@ -90,16 +83,17 @@ def delete_route_endpoint(db, route_id):
     deleted_route = delete_route(db, route_id=route_id)
     return not_found(deleted_route, "Route") or jsonify({'message': 'Route deleted successfully'})
 
-# more accessible search, filtering, sorting, and table display of rows with pagination
-@route_bp.route('/routes/search', methods=['GET'])
-@with_db
-def search_routes(db):
+# Builds the route search query from the request's query, filter and sort parameters, shared by
+# search and export. Raises ValueError for invalid parameters
+def build_route_search_query(db):
     search_term = request.args.get('query', '')
-    sort_by = request.args.get('sortBy', 'route_id')  # Default sort by route ID
+    sort_by = request.args.get('sortBy') or 'route_id'  # Default sort by route ID
     sort_order = request.args.get('sortOrder', 'asc')  # Default sort order ascending
+    search_mode = request.args.get('mode', 'substring')  # no search vector, substring matching only
 
-    # List of attributes to search for string fields
-    search_fields = [Route.origin, Route.destination]
+    # Reject unknown sort columns and search modes before touching the database
+    validate_sorting(Route, sort_by, sort_order)
+    validate_search_mode(search_mode, modes=('substring',))
 
     query = db.query(Route)
 
@@ -111,29 +105,79 @@ def search_routes(db):
         if search_term.isdigit():
             search_filters.append(Route.route_id == int(search_term))
 
-        # Apply ILIKE for string fields
-        for field in search_fields:
-            search_filters.append(field.ilike(f"%{search_term}%"))
+        # Match the combined search document so the trigram index can serve the ILIKE
+        search_filters.append(ROUTE_SEARCH_DOCUMENT.ilike(f"%{search_term}%"))
         
         query = query.filter(or_(*search_filters))
 
-    # Apply sorting
-    if sort_order == 'asc':
-        query = query.order_by(asc(getattr(Route, sort_by)))
-    else:
-        query = query.order_by(desc(getattr(Route, sort_by)))
+    # Structured filters (equality, IN lists, ranges and null checks) narrow the results further
+    query = build_filter_query(query, parse_filter_params(request.args.get('filter')), Route)
+
+    return query, sort_by, sort_order
+
+# more accessible search, filtering, sorting, and table display of rows with pagination
+@route_bp.route('/routes/search', methods=['GET'])
+@with_read_db
+@conditional_table(Route, 'routes')
+@cached('routes')
+def search_routes(db):
+    # Search term, structured filters and sorting from the request, invalid parameters are rejected before touching the database
+    try:
+        query, sort_by, sort_order = build_route_search_query(db)
+        fields = parse_fields(Route, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Plain column rows are serialized straight into the response, no ORM objects are built. A sparse
+    # fieldset ("fields") only reads the requested columns, plus the ones the cursor needs
+    query = project_columns(query, Route, fields, required=(sort_by,))
+
+    # Cursor (keyset) pagination seeks past the last seen row instead of skipping pages
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        per_page = request.args.get('per_page', 10, type=int)
+        try:
+            routes, next_cursor = keyset_paginate(query, Route, sort_by, sort_order, cursor, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'routes': rows_to_dicts(routes, Route, fields)
+        })
+
+    # Apply sorting with the primary key as a deterministic tiebreaker
+    query = apply_sorting_query(query, sort_by, sort_order, Route)
 
     # Get pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    skip = (page - 1) * per_page
+    count_strategy = request.args.get('count', 'exact')
 
-    routes = query.offset(skip).limit(per_page).all()
-    total_routes = query.count()
+    # Fetch the page and its total with the requested count strategy (exact, estimated, capped or has_more)
+    try:
+        routes, total_routes, has_more = paginate(db, query, Route, page, per_page, count_strategy)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({
         'page': page,
         'per_page': per_page,
         'total_routes': total_routes,
-        'routes': [route.to_dict() for route in routes]
-    })
\ No newline at end of file
+        'has_more': has_more,
+        'routes': rows_to_dicts(routes, Route, fields)
+    })
+
+# streams every matching route as CSV, NDJSON, Arrow or Parquet ("format" or the Accept header), taking the same
+# query, filter and sort parameters as search
+@route_bp.route('/routes/export', methods=['GET'])
+@with_read_db
+@jwt_required()
+def export_routes(db):
+    try:
+        query, sort_by, sort_order = build_route_search_query(db)
+        fields = parse_fields(Route, request.args.get('fields'))
+        query = apply_sorting_query(query, sort_by, sort_order, Route)
+        return stream_export(query, Route, requested_export_format(), 'routes', fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
\ No newline at end of file
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from db.connection import engine, pool_stats, replica_engines, replica_pool_stats
+from db.session import replica_router
+from utils.cache import result_cache
+from utils.references import reference_cache
+
+# declares Blueprint for operational statistics
+stats_bp = Blueprint('stats', __name__)
+
+# returns cache hit/miss/eviction counters for sizing the result cache
+@stats_bp.route('/stats/cache', methods=['GET'])
+@jwt_required()
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+# returns hit/miss/eviction counters of the reference cache used by foreign key checks
+@stats_bp.route('/stats/references', methods=['GET'])
+@jwt_required()
+def reference_stats():
+    return jsonify(reference_cache.stats())
+
+# returns connection pool usage (connections in use, overflow, checkout waits, timeouts and invalidations),
+# plus the pool, lag and primary fallbacks of each read replica when replicas are configured
+@stats_bp.route('/stats/pool', methods=['GET'])
+@jwt_required()
+def pool_stats_endpoint():
+    snapshot = pool_stats.snapshot(engine.pool)
+    if replica_engines:
+        snapshot['replicas'] = [stats.snapshot(replica.pool) for replica, stats in zip(replica_engines, replica_pool_stats)]
+        snapshot['replica_routing'] = replica_router.stats()
+    return jsonify(snapshot)
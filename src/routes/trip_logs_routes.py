@@ -1,13 +1,17 @@
-import contextlib
-from functools import wraps
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
-from sqlalchemy import or_, String, asc, desc
-from db.connection import SessionLocal
-from models.trip_logs_model import TripLog
-from models.vehicle_model import Vehicle
+from sqlalchemy import or_
+from db.session import with_db, with_read_db
+from models.trip_logs_model import TripLog, TRIP_LOG_SEARCH_DOCUMENT
+from utils.query_helpers import apply_fulltext_search, apply_sorting_query, apply_time_range, build_filter_query, get_row, keyset_paginate, paginate, parse_fields, parse_filter_params, project_columns, rows_to_dicts, validate_search_mode, validate_sorting
+from utils.bulk import bulk_status, parse_bulk_items
+from utils.export import requested_export_format, stream_export
+from utils.conditional import conditional_row, conditional_table
+from utils.cache import cached
+from services.archive_services import include_archived
 from services.trip_logs_services import (
     create_trip_log,
+    create_trip_logs_bulk,
     get_trip_log,
     update_trip_log,
     delete_trip_log
@@ -16,22 +20,6 @@ from services.trip_logs_services import (
 # Blueprint for trip log routes
 trip_log_bp = Blueprint('trip_log', __name__)
 
-# Helper function to fetch the DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Decorator to fetch DB session
-def with_db(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        with contextlib.closing(next(get_db())) as db:
-            return f(db, *args, **kwargs)
-    return decorated_function
-
 # Helper function to return a not found response
 def check_trip_log_not_found(trip_log):
     if not trip_log:
@@ -60,55 +48,71 @@ def update_trip_log_form(db, trip_id):
 
 # Trip log creation endpoint
 @trip_log_bp.route('/trip_logs', methods=['POST'])
+@with_db
 @jwt_required()
-def create_trip_log_endpoint():
-    db = next(get_db())
+def create_trip_log_endpoint(db):
     data = request.get_json()
 
+    # the trip log and the vehicle's odometer are written in one transaction by the service
     try:
         new_trip_log = create_trip_log(db, data)
-
-        # Update vehicle mileage if mileage_end is provided
-        if new_trip_log.mileage_end:
-            vehicle = db.query(Vehicle).filter(Vehicle.vehicle_id == new_trip_log.vehicle_id).first()
-            if vehicle:
-                vehicle.mileage = new_trip_log.mileage_end
-                db.commit()
-
         return jsonify(new_trip_log.to_dict()), 201
 
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 400
-    finally:
-        db.close()
+
+# Creates many trip logs from a JSON array or NDJSON body in one transaction, reporting a result per item
+@trip_log_bp.route('/trip_logs/bulk', methods=['POST'])
+@with_db
+@jwt_required()
+def create_trip_logs_bulk_endpoint(db):
+    try:
+        items = parse_bulk_items()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    results = create_trip_logs_bulk(db, items)
+    return jsonify({'results': results}), bulk_status(results)
 
 # Return a trip log by ID
 @trip_log_bp.route('/trip_logs/<int:trip_id>', methods=['GET'])
-@with_db
+@with_read_db
 @jwt_required()
+@conditional_row(TripLog)
+@cached('trip_logs')
 def get_trip_log_by_id_endpoint(db, trip_id):
-    trip_log = get_trip_log(db, trip_id=trip_id)
+    # "fields" selects a sparse fieldset, only those columns are read
+    try:
+        fields = parse_fields(TripLog, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    trip_log = get_row(db, TripLog, trip_id, fields)
     not_found = check_trip_log_not_found(trip_log)
     if not_found:
         return not_found
-    return jsonify(trip_log.to_dict())
+    return jsonify(trip_log)
 
-# Unified search, filtering, sorting, and pagination for trip logs
-@trip_log_bp.route('/trip_logs/search', methods=['GET'])
-@with_db
-def search_trip_logs(db):
+# Builds the trip log search query from the request's query, filter and sort parameters, shared by
+# search and export. Raises ValueError for invalid parameters
+def build_trip_log_search_query(db):
     search_term = request.args.get('query', '')
-    sort_by = request.args.get('sortBy', 'trip_id')  # Default sort by trip ID
+    sort_by = request.args.get('sortBy') or 'trip_id'  # Default sort by trip ID
     sort_order = request.args.get('sortOrder', 'asc')  # Default sort order ascending
+    search_mode = request.args.get('mode', 'substring')  # 'fulltext' searches the indexed search vector
 
-    # Attributes to search for both string and numeric fields
-    search_fields = [TripLog.trip_id, TripLog.driver_id, TripLog.vehicle_id, TripLog.status]
+    # Reject unknown sort columns and search modes before touching the database
+    validate_sorting(TripLog, sort_by, sort_order)
+    validate_search_mode(search_mode)
 
     query = db.query(TripLog)
+    rank = None
+
+    # Full-text mode matches whole words, "phrases" and prefix* terms and ranks results by relevance
+    if search_term and search_mode == 'fulltext':
+        query, rank = apply_fulltext_search(query, TripLog.__table__.c.search_vector, search_term)
 
     # Search for the term in all specified fields
-    if search_term:
+    elif search_term:
         search_filters = []
 
         try:
@@ -119,35 +123,134 @@ def search_trip_logs(db):
         except ValueError:
             pass  # Not numeric, continue to search string fields
 
-        for field in search_fields:
-            if isinstance(field.type, String):
-                search_filters.append(field.ilike(f"%{search_term}%"))
+        # Match the combined search document so the trigram index can serve the ILIKE
+        search_filters.append(TRIP_LOG_SEARCH_DOCUMENT.ilike(f"%{search_term}%"))
 
         query = query.filter(or_(*search_filters))
 
-    # Apply sorting
-    query = query.order_by(asc(getattr(TripLog, sort_by))) if sort_order == 'asc' else query.order_by(desc(getattr(TripLog, sort_by)))
+    # Structured filters (equality, IN lists, ranges and null checks) narrow the results further
+    query = build_filter_query(query, parse_filter_params(request.args.get('filter')), TripLog)
+
+    # include_archived=true also searches the rows moved to the archive table
+    if request.args.get('include_archived', 'false').lower() == 'true':
+        query = include_archived(query)
+
+    return query, rank, sort_by, sort_order
+
+# Unified search, filtering, sorting, and pagination for trip logs
+@trip_log_bp.route('/trip_logs/search', methods=['GET'])
+@with_read_db
+@conditional_table(TripLog, 'trip_logs')
+@cached('trip_logs')
+def search_trip_logs(db):
+    # Search term, structured filters and sorting from the request, invalid parameters are rejected before touching the database
+    try:
+        query, rank, sort_by, sort_order = build_trip_log_search_query(db)
+        fields = parse_fields(TripLog, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Plain column rows are serialized straight into the response, no ORM objects are built. A sparse
+    # fieldset ("fields") only reads the requested columns, plus the ones the cursor needs
+    query = project_columns(query, TripLog, fields, required=(sort_by,))
+
+    # Cursor (keyset) pagination seeks past the last seen row instead of skipping pages
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        if rank is not None:
+            return jsonify({'error': 'Cursor pagination is not supported for full-text search.'}), 400
+        per_page = request.args.get('per_page', 10, type=int)
+        try:
+            trip_logs, next_cursor = keyset_paginate(query, TripLog, sort_by, sort_order, cursor, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'trip_logs': rows_to_dicts(trip_logs, TripLog, fields)
+        })
+
+    # Apply sorting with the primary key as a deterministic tiebreaker (full-text results are ordered by relevance)
+    if rank is not None:
+        query = query.order_by(rank.desc(), TripLog.trip_id)
+    else:
+        query = apply_sorting_query(query, sort_by, sort_order, TripLog)
 
     # Pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    skip = (page - 1) * per_page
+    count_strategy = request.args.get('count', 'estimated')  # Large table, never counted in full by default
 
-    trip_logs = query.offset(skip).limit(per_page).all()
-    total_trip_logs = query.count()
+    # Fetch the page and its total with the requested count strategy (exact, estimated, capped or has_more)
+    try:
+        trip_logs, total_trip_logs, has_more = paginate(db, query, TripLog, page, per_page, count_strategy)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({
         'page': page,
         'per_page': per_page,
         'total_trip_logs': total_trip_logs,
-        'trip_logs': [trip_log.to_dict() for trip_log in trip_logs]
+        'has_more': has_more,
+        'trip_logs': rows_to_dicts(trip_logs, TripLog, fields)
     })
 
+# streams every matching trip log as CSV, NDJSON, Arrow or Parquet ("format" or the Accept header), taking the same
+# query, filter and sort parameters as search
+@trip_log_bp.route('/trip_logs/export', methods=['GET'])
+@with_read_db
+@jwt_required()
+def export_trip_logs(db):
+    try:
+        query, rank, sort_by, sort_order = build_trip_log_search_query(db)
+        fields = parse_fields(TripLog, request.args.get('fields'))
+        if rank is not None:
+            query = query.order_by(rank.desc(), TripLog.trip_id)
+        else:
+            query = apply_sorting_query(query, sort_by, sort_order, TripLog)
+        return stream_export(query, TripLog, requested_export_format(), 'trip_logs', fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# One page of a vehicle's or driver's trips, newest first, optionally limited to a start_time range ("from", "to").
+# The (vehicle_id / driver_id, start_time, trip_id) index is walked backwards from the cursor, no other rows are read
+def trip_log_history(db, owner_column, owner_id):
+    try:
+        fields = parse_fields(TripLog, request.args.get('fields'))
+        query = db.query(TripLog).filter(owner_column == owner_id)
+        query = apply_time_range(query, TripLog.start_time, request.args.get('from'), request.args.get('to'))
+        query = project_columns(query, TripLog, fields, required=('start_time',))
+        per_page = request.args.get('per_page', 10, type=int)
+        trip_logs, next_cursor = keyset_paginate(query, TripLog, 'start_time', 'desc', request.args.get('cursor'), per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'trip_logs': rows_to_dicts(trip_logs, TripLog, fields)
+    })
+
+# Trip history of a vehicle
+@trip_log_bp.route('/vehicles/<int:vehicle_id>/trip_logs', methods=['GET'])
+@with_read_db
+@jwt_required()
+@cached('trip_logs')
+def get_vehicle_trip_logs(db, vehicle_id):
+    return trip_log_history(db, TripLog.vehicle_id, vehicle_id)
+
+# Trip history of a driver
+@trip_log_bp.route('/drivers/<int:driver_id>/trip_logs', methods=['GET'])
+@with_read_db
+@jwt_required()
+@cached('trip_logs')
+def get_driver_trip_logs(db, driver_id):
+    return trip_log_history(db, TripLog.driver_id, driver_id)
+
 # Update trip log details
 @trip_log_bp.route('/trip_logs/<int:trip_id>', methods=['PUT'])
+@with_db
 @jwt_required()
-def update_trip_log_endpoint(trip_id):
-    db = next(get_db())
+def update_trip_log_endpoint(db, trip_id):
     data = request.get_json()
 
     try:
@@ -155,21 +258,11 @@ def update_trip_log_endpoint(trip_id):
         not_found = check_trip_log_not_found(updated_trip_log)
         if not_found:
             return not_found
-
-        # Update vehicle mileage if mileage_end is provided
-        if updated_trip_log.mileage_end:
-            vehicle = db.query(Vehicle).filter(Vehicle.vehicle_id == updated_trip_log.vehicle_id).first()
-            if vehicle:
-                vehicle.mileage = updated_trip_log.mileage_end
-                db.commit()
-
         return jsonify(updated_trip_log.to_dict()), 200
 
     except Exception as e:
         db.rollback()
         return jsonify({'error': str(e)}), 400
-    finally:
-        db.close()
 
 # Delete a trip log
 @trip_log_bp.route('/trip_logs/<int:trip_id>', methods=['DELETE'])
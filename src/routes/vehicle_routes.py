@@ -1,12 +1,16 @@
-import contextlib
-from functools import wraps
 from flask import Blueprint, render_template, request, jsonify
 from flask_jwt_extended import jwt_required
-from sqlalchemy import String, or_, asc, desc
-from db.connection import SessionLocal
-from models.vehicle_model import Vehicle
+from sqlalchemy import String, or_
+from db.session import with_db, with_read_db
+from models.vehicle_model import Vehicle, VEHICLE_SEARCH_DOCUMENT
+from utils.query_helpers import apply_sorting_query, build_filter_query, get_row, keyset_paginate, paginate, parse_fields, parse_filter_params, project_columns, rows_to_dicts, validate_search_mode, validate_sorting
+from utils.bulk import bulk_status, parse_bulk_items
+from utils.export import requested_export_format, stream_export
+from utils.conditional import conditional_row, conditional_table
+from utils.cache import cached
 from services.vehicle_services import (
     create_vehicle,
+    create_vehicles_bulk,
     get_vehicle,
     update_vehicle,
     delete_vehicle
@@ -15,22 +19,6 @@ from services.vehicle_services import (
 # declares Blueprint for vehicle routes
 vehicle_bp = Blueprint('vehicle', __name__)
 
-# Helper function to fetch the DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# fetches the DB session with a decorator
-def with_db(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        with contextlib.closing(next(get_db())) as db:
-            return f(db, *args, **kwargs)
-    return decorated_function
-
 # Helper function to handle "Vehicle not found" case
 def vehicle_not_found_response(vehicle):
     if not vehicle:
@@ -65,24 +53,44 @@ def create_vehicle_endpoint(db):
     new_vehicle = create_vehicle(db, data)
     return jsonify(new_vehicle.to_dict()), 201
 
+# creates many vehicles from a JSON array or NDJSON body, reporting a result per item
+@vehicle_bp.route('/vehicles/bulk', methods=['POST'])
+@with_db
+@jwt_required()
+def create_vehicles_bulk_endpoint(db):
+    try:
+        items = parse_bulk_items()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    results = create_vehicles_bulk(db, items)
+    return jsonify({'results': results}), bulk_status(results)
+
 # returns a vehicle by ID
 @vehicle_bp.route('/vehicles/<int:vehicle_id>', methods=['GET'])
-@with_db
+@with_read_db
 @jwt_required()
+@conditional_row(Vehicle)
+@cached('vehicles')
 def get_vehicle_by_id_endpoint(db, vehicle_id):
-    vehicle = get_vehicle(db, vehicle_id=vehicle_id)
-    return vehicle_not_found_response(vehicle) or jsonify(vehicle.to_dict())
-
-# more accessible search, filtering, sorting, and table display of rows with pagination
-@vehicle_bp.route('/vehicles/search', methods=['GET'])
-@with_db
-def search_vehicles(db):
+    # "fields" selects a sparse fieldset, only those columns are read
+    try:
+        fields = parse_fields(Vehicle, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    vehicle = get_row(db, Vehicle, vehicle_id, fields)
+    return vehicle_not_found_response(vehicle) or jsonify(vehicle)
+
+# Builds the vehicle search query from the request's query, filter and sort parameters, shared by
+# search and export. Raises ValueError for invalid parameters
+def build_vehicle_search_query(db):
     search_term = request.args.get('query', '')
-    sort_by = request.args.get('sortBy', 'make')  # Default sort by vehicle make
+    sort_by = request.args.get('sortBy') or 'make'  # Default sort by vehicle make
     sort_order = request.args.get('sortOrder', 'asc')  # Default sort order ascending
+    search_mode = request.args.get('mode', 'substring')  # no search vector, substring matching only
 
-    # List of attributes to search
-    search_fields = [Vehicle.make, Vehicle.model, Vehicle.registration_number, Vehicle.status, Vehicle.fuel_type]
+    # Reject unknown sort columns and search modes before touching the database
+    validate_sorting(Vehicle, sort_by, sort_order)
+    validate_search_mode(search_mode, modes=('substring',))
 
     query = db.query(Vehicle)
 
@@ -95,38 +103,90 @@ def search_vehicles(db):
             search_filters.append(Vehicle.vehicle_id == int(search_term))
             search_filters.append(Vehicle.year == int(search_term))
 
-        # Apply ILIKE to string fields
-        for field in search_fields:
-            search_filters.append(field.ilike(f"%{search_term}%"))
+        # Match the combined search document so the trigram index can serve the ILIKE
+        search_filters.append(VEHICLE_SEARCH_DOCUMENT.ilike(f"%{search_term}%"))
         
         query = query.filter(or_(*search_filters))
 
-    # Apply sorting
-    if sort_order == 'asc':
-        query = query.order_by(asc(getattr(Vehicle, sort_by)))
-    else:
-        query = query.order_by(desc(getattr(Vehicle, sort_by)))
+    # Structured filters (equality, IN lists, ranges and null checks) narrow the results further
+    query = build_filter_query(query, parse_filter_params(request.args.get('filter')), Vehicle)
+
+    return query, sort_by, sort_order
+
+# more accessible search, filtering, sorting, and table display of rows with pagination
+@vehicle_bp.route('/vehicles/search', methods=['GET'])
+@with_read_db
+@conditional_table(Vehicle, 'vehicles')
+@cached('vehicles')
+def search_vehicles(db):
+    # Search term, structured filters and sorting from the request, invalid parameters are rejected before touching the database
+    try:
+        query, sort_by, sort_order = build_vehicle_search_query(db)
+        fields = parse_fields(Vehicle, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Plain column rows are serialized straight into the response, no ORM objects are built. A sparse
+    # fieldset ("fields") only reads the requested columns, plus the ones the cursor needs
+    query = project_columns(query, Vehicle, fields, required=(sort_by,))
+
+    # Cursor (keyset) pagination seeks past the last seen row instead of skipping pages
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        per_page = request.args.get('per_page', 10, type=int)
+        try:
+            vehicles, next_cursor = keyset_paginate(query, Vehicle, sort_by, sort_order, cursor, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'vehicles': rows_to_dicts(vehicles, Vehicle, fields)
+        })
+
+    # Apply sorting with the primary key as a deterministic tiebreaker
+    query = apply_sorting_query(query, sort_by, sort_order, Vehicle)
 
     # Get pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    skip = (page - 1) * per_page
+    count_strategy = request.args.get('count', 'exact')
 
-    vehicles = query.offset(skip).limit(per_page).all()
-    total_vehicles = query.count()
+    # Fetch the page and its total with the requested count strategy (exact, estimated, capped or has_more)
+    try:
+        vehicles, total_vehicles, has_more = paginate(db, query, Vehicle, page, per_page, count_strategy)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({
         'page': page,
         'per_page': per_page,
         'total_vehicles': total_vehicles,
-        'vehicles': [vehicle.to_dict() for vehicle in vehicles]
+        'has_more': has_more,
+        'vehicles': rows_to_dicts(vehicles, Vehicle, fields)
     })
 
+# streams every matching vehicle as CSV, NDJSON, Arrow or Parquet ("format" or the Accept header), taking the same
+# query, filter and sort parameters as search
+@vehicle_bp.route('/vehicles/export', methods=['GET'])
+@with_read_db
+@jwt_required()
+def export_vehicles(db):
+    try:
+        query, sort_by, sort_order = build_vehicle_search_query(db)
+        fields = parse_fields(Vehicle, request.args.get('fields'))
+        query = apply_sorting_query(query, sort_by, sort_order, Vehicle)
+        return stream_export(query, Vehicle, requested_export_format(), 'vehicles', fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 # Endpoint to get the mileage of a vehicle by ID
 @vehicle_bp.route('/vehicles/<int:vehicle_id>/mileage', methods=['GET'])
+@with_read_db
 @jwt_required()
-def get_vehicle_mileage(vehicle_id):
-    db = next(get_db())
+@conditional_row(Vehicle)
+@cached('vehicles')
+def get_vehicle_mileage(db, vehicle_id):
     vehicle = db.query(Vehicle).filter(Vehicle.vehicle_id == vehicle_id).first()
 
     if vehicle:
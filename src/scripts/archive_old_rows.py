@@ -0,0 +1,33 @@
+# Script moving completed trips and maintenance records past their retention age into the archive tables, meant to run
+# nightly from cron. Each batch is its own short transaction, an interrupted run is picked up by the next one
+# e.g. 30 3 * * * cd /path/to/src && python3 scripts/archive_old_rows.py
+# usage: python3 scripts/archive_old_rows.py [trip log age in days] [maintenance record age in days]
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from db.connection import SessionLocal
+from services.archive_services import (
+    ARCHIVE_MAINTENANCE_RECORDS_AFTER_DAYS, ARCHIVE_TRIP_LOGS_AFTER_DAYS, archive_maintenance_records, archive_trip_logs,
+)
+
+def main():
+    trip_log_days = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_TRIP_LOGS_AFTER_DAYS
+    maintenance_days = int(sys.argv[2]) if len(sys.argv) > 2 else ARCHIVE_MAINTENANCE_RECORDS_AFTER_DAYS
+
+    db = SessionLocal()
+    try:
+        for name, archive, days in (
+            ('trip_logs', archive_trip_logs, trip_log_days),
+            ('maintenance_records', archive_maintenance_records, maintenance_days),
+        ):
+            started = time.perf_counter()
+            moved = archive(db, days)
+            print(f'{name:<20} {moved} row(s) older than {days} days archived in {time.perf_counter() - started:.1f}s')
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    main()
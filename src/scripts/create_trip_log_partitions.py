@@ -0,0 +1,23 @@
+# Script creating the upcoming monthly trip_logs partitions, meant to run daily from cron (it is idempotent)
+# e.g. 0 3 * * * cd /path/to/src && python3 scripts/create_trip_log_partitions.py
+# usage: python3 scripts/create_trip_log_partitions.py [months ahead]
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from db.connection import engine
+from db.partitions import TRIP_LOG_PARTITION_MONTHS_AHEAD, create_trip_log_partitions, trip_log_partitions
+
+def main():
+    months_ahead = int(sys.argv[1]) if len(sys.argv) > 1 else TRIP_LOG_PARTITION_MONTHS_AHEAD
+    with engine.begin() as connection:
+        created = create_trip_log_partitions(connection, months_ahead)
+        partitions = trip_log_partitions(connection)
+
+    print(f'{created} partition(s) created, {len(partitions)} in total')
+    for name, bounds in partitions:
+        print(f'{name:<24} {bounds}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Script checking that trip log queries with a start_time range only read the partitions covering that range
+# (partition pruning), for the history endpoint, search filters and an unbounded query for comparison
+# usage: python3 scripts/explain_partitions.py [YYYY-MM]
+import os
+import re
+import sys
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import text
+from db.connection import SessionLocal
+from db.partitions import add_months, trip_log_partitions
+from models.trip_logs_model import TripLog
+from utils.query_helpers import apply_time_range, build_filter_query
+
+def explain(db, query):
+    statement = query.statement.compile(db.bind, compile_kwargs={'literal_binds': True})
+    return '\n'.join(row[0] for row in db.execute(text(f'EXPLAIN {statement}')))
+
+# Partitions a plan reads, by name
+def scanned_partitions(plan, partition_names):
+    return {name for name in re.findall(r' on (trip_logs_\w+)', plan) if name in partition_names}
+
+def main():
+    month = date.fromisoformat(sys.argv[1] + '-01') if len(sys.argv) > 1 else date.today().replace(day=1)
+    next_month = add_months(month, 1)
+    expected = {f'trip_logs_{month:%Y_%m}'}
+
+    db = SessionLocal()
+    failures = 0
+    try:
+        partition_names = {name for name, _ in trip_log_partitions(db.connection())}
+        if not expected <= partition_names:
+            print(f'No partition for {month:%Y-%m}, run scripts/create_trip_log_partitions.py first')
+            sys.exit(1)
+
+        queries = [
+            ('vehicle history for the month', True, apply_time_range(
+                db.query(TripLog).filter(TripLog.vehicle_id == 1), TripLog.start_time, month.isoformat(), next_month.isoformat(),
+            ).order_by(TripLog.start_time.desc(), TripLog.trip_id.desc()).limit(10)),
+            ('search filter on start_time', True, build_filter_query(
+                db.query(TripLog), {'start_time': {'gte': month.isoformat(), 'lt': next_month.isoformat()}}, TripLog,
+            ).order_by(TripLog.trip_id).limit(10)),
+            ('unbounded search (no pruning expected)', False, db.query(TripLog).order_by(TripLog.trip_id).limit(10)),
+        ]
+        for name, prunes, query in queries:
+            plan = explain(db, query)
+            scanned = scanned_partitions(plan, partition_names)
+            ok = scanned <= expected if prunes else len(scanned) == len(partition_names)
+            failures += not ok
+            print(f"{name}: {'OK' if ok else 'FAILED'}, reads {len(scanned)} of {len(partition_names)} partitions")
+            print(plan, end='\n\n')
+    finally:
+        db.rollback()
+        db.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# Script to check that the free-text search queries are served by the trigram indexes
+# usage: python3 scripts/explain_search.py [search term]
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import text
+from db.connection import SessionLocal
+from models.vehicle_model import Vehicle, VEHICLE_SEARCH_DOCUMENT
+from models.driver_model import Driver, DRIVER_SEARCH_DOCUMENT
+from models.m_records_model import MaintenanceRecord, MAINTENANCE_SEARCH_DOCUMENT
+from models.routes_model import Route, ROUTE_SEARCH_DOCUMENT
+from models.trip_logs_model import TripLog, TRIP_LOG_SEARCH_DOCUMENT
+
+SEARCHES = [
+    (Vehicle, VEHICLE_SEARCH_DOCUMENT, 'ix_vehicles_search_trgm'),
+    (Driver, DRIVER_SEARCH_DOCUMENT, 'ix_drivers_search_trgm'),
+    (MaintenanceRecord, MAINTENANCE_SEARCH_DOCUMENT, 'ix_maintenance_records_search_trgm'),
+    (Route, ROUTE_SEARCH_DOCUMENT, 'ix_routes_search_trgm'),
+    (TripLog, TRIP_LOG_SEARCH_DOCUMENT, 'ix_trip_logs_search_trgm'),
+]
+
+def explain(db, query):
+    statement = query.statement.compile(db.bind, compile_kwargs={'literal_binds': True})
+    return '\n'.join(row[0] for row in db.execute(text(f'EXPLAIN {statement}')))
+
+def main():
+    search_term = sys.argv[1] if len(sys.argv) > 1 else 'brake'
+    db = SessionLocal()
+    failures = 0
+    try:
+        # small development tables are cheaper to scan, so sequential scans are disabled to expose index use
+        db.execute(text('SET LOCAL enable_seqscan = off'))
+        for model, document, index_name in SEARCHES:
+            plan = explain(db, db.query(model).filter(document.ilike(f'%{search_term}%')))
+            used = index_name in plan
+            failures += not used
+            print(f"{model.__tablename__}: {'uses' if used else 'DOES NOT use'} {index_name}")
+            print(plan, end='\n\n')
+    finally:
+        db.rollback()
+        db.close()
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
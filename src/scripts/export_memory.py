@@ -0,0 +1,68 @@
+# Script checking that exports stream in constant memory: the peak memory of exporting all rows must stay close to the
+# peak of exporting a hundredth of them. The rows are generated inside a transaction that is rolled back at the end
+# usage: python3 scripts/export_memory.py [rows] [csv|ndjson]
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from db.connection import engine
+from models.vehicle_model import Vehicle
+from utils.export import EXPORT_BATCH_SIZE, export_rows
+
+GENERATE_VEHICLES_SQL = text("""
+    WITH RECURSIVE series(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM series WHERE n < :rows)
+    INSERT INTO vehicles (make, model, year, registration_number, status, mileage, fuel_type)
+    SELECT 'Export', 'Memory', 2000 + n % 25, 'EXPORT-MEMORY-' || n, 'active', n, 'diesel' FROM series
+""")
+
+# Exports the query and returns (rows exported, bytes produced, peak traced memory in bytes, seconds)
+def measure(query, export_format):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = lines = 0
+    for chunk in export_rows(query, Vehicle, export_format):
+        size += len(chunk)
+        lines += chunk.count('\n')
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    header_lines = 1 if export_format == 'csv' else 0
+    return lines - header_lines, size, peak, elapsed
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    export_format = sys.argv[2] if len(sys.argv) > 2 else 'csv'
+    small_rows = max(rows // 100, EXPORT_BATCH_SIZE)
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.execute(GENERATE_VEHICLES_SQL, {'rows': rows})
+            db = Session(bind=connection)
+            query = db.query(Vehicle).filter(Vehicle.make == 'Export').order_by(Vehicle.vehicle_id)
+
+            results = []
+            for limit in (small_rows, rows):
+                exported, size, peak, elapsed = measure(query.limit(limit), export_format)
+                results.append(peak)
+                print(f'{exported:>9} rows  {size / 1e6:8.1f} MB {export_format}  peak memory {peak / 1e6:6.2f} MB  {elapsed:6.1f} s')
+                if exported != limit:
+                    print(f'Expected {limit} rows, exported {exported}')
+                    sys.exit(1)
+        finally:
+            transaction.rollback()
+
+    # memory must not grow with the row count, allow for allocator noise on top of the small export's peak
+    small_peak, full_peak = results
+    if full_peak > small_peak * 1.5 + 1e6:
+        print(f'Peak memory grew from {small_peak / 1e6:.2f} MB to {full_peak / 1e6:.2f} MB')
+        sys.exit(1)
+    print('Peak memory stayed flat')
+
+if __name__ == '__main__':
+    main()
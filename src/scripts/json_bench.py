@@ -0,0 +1,81 @@
+# Micro-benchmark of response serialization for the five models: to_dict() on in-memory rows followed by JSON encoding
+# with Flask's default provider, the fast provider on the json module, and the fast provider on orjson (when installed)
+# No database is needed, the rows are built in memory
+# usage: python3 scripts/json_bench.py [rows] [repeats]
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from models.driver_model import Driver
+from models.m_records_model import MaintenanceRecord
+from models.routes_model import Route
+from models.trip_logs_model import TripLog
+from models.vehicle_model import Vehicle
+from utils import serialization
+from utils.serialization import FastJSONProvider
+
+NOW = datetime(2024, 1, 1, 8, 30, 15, 123456)
+
+def make_rows(rows):
+    return {
+        'vehicles': [Vehicle(vehicle_id=n, make='Volvo', model='FH16', year=2020, registration_number=f'BENCH-{n}',
+                             status='active', mileage=n * 10, fuel_type='diesel', created_at=NOW, updated_at=NOW)
+                     for n in range(rows)],
+        'drivers': [Driver(driver_id=n, name='Bench Driver', license_number=f'LIC-{n}', license_expiry_date=date(2030, 1, 1),
+                           phone_number='0123456789', email=f'driver{n}@example.com', assigned_vehicle_id=n,
+                           created_at=NOW, updated_at=NOW)
+                    for n in range(rows)],
+        'routes': [Route(route_id=n, origin='Dublin', destination='Cork', distance=256.4, estimated_duration=180,
+                         created_at=NOW, updated_at=NOW)
+                   for n in range(rows)],
+        'trip_logs': [TripLog(trip_id=n, vehicle_id=n, driver_id=n, route_id=n, start_time=NOW, end_time=NOW + timedelta(hours=3),
+                              mileage_start=1000, mileage_end=1256, status='completed', notes='Delivered on time',
+                              created_at=NOW, updated_at=NOW)
+                      for n in range(rows)],
+        'maintenance_records': [MaintenanceRecord(maintenance_id=n, vehicle_id=n, driver_id=n, maintenance_type='service',
+                                                  description='Oil and filter change', cost=Decimal('249.99'),
+                                                  maintenance_date=date(2024, 1, 2), notes=None, created_at=NOW, updated_at=NOW)
+                                for n in range(rows)],
+    }
+
+# Serializes the rows like a search page (to_dict() per row, then one JSON response) and returns rows per second
+def run(app, objects, repeats):
+    started = time.perf_counter()
+    with app.app_context():
+        for _ in range(repeats):
+            app.json.response({'items': [obj.to_dict() for obj in objects]})
+    return len(objects) * repeats / (time.perf_counter() - started)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    default_app = Flask(__name__)
+    default_app.json = DefaultJSONProvider(default_app)
+    stdlib_app = Flask(__name__)
+    stdlib_app.json = FastJSONProvider(stdlib_app)
+    stdlib_app.json.use_orjson = False
+    providers = [('Flask default provider', default_app), ('fast provider, json module', stdlib_app)]
+    if serialization.orjson is not None:
+        orjson_app = Flask(__name__)
+        orjson_app.json = FastJSONProvider(orjson_app)
+        orjson_app.json.use_orjson = True
+        providers.append(('fast provider, orjson', orjson_app))
+    else:
+        print('orjson is not installed, skipping it')
+
+    print(f'{rows}-row pages, {repeats} repeats (rows/s)')
+    for entity, objects in make_rows(rows).items():
+        run(default_app, objects, 1)  # warm up the serializers
+        rates = [run(app, objects, repeats) for _, app in providers]
+        cells = '  '.join(f'{name}: {rate:9.0f}' for (name, _), rate in zip(providers, rates))
+        print(f'{entity:<20} {cells}  ({rates[-1] / rates[0]:.2f}x)')
+
+if __name__ == '__main__':
+    main()
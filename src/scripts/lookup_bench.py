@@ -0,0 +1,65 @@
+# Benchmark of single-row lookups by primary key for the five models: the query built per call as the services used to
+# (db.query(...).filter(...).first()) against the prebuilt statements of get_by_primary_key(), and the same for the
+# projected get_row() reads of the GET endpoints. Reports the time per call and the overhead saved, the database round
+# trip is included in both columns, so the difference is the query construction and compilation cost
+# usage: python3 scripts/lookup_bench.py [calls]
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from db.connection import engine
+from models.driver_model import Driver
+from models.m_records_model import MaintenanceRecord
+from models.routes_model import Route
+from models.trip_logs_model import TripLog
+from models.vehicle_model import Vehicle
+from utils.query_helpers import get_by_primary_key, get_primary_key, get_row, project_columns, rows_to_dicts
+
+MODELS = (Vehicle, Driver, Route, TripLog, MaintenanceRecord)
+
+def query_object(db, model, pk_value):
+    return db.query(model).filter(get_primary_key(model) == pk_value).first()
+
+def query_row(db, model, pk_value):
+    query = db.query(model).filter(get_primary_key(model) == pk_value)
+    row = project_columns(query, model).first()
+    return rows_to_dicts([row], model)[0] if row is not None else None
+
+def prebuilt_row(db, model, pk_value):
+    return get_row(db, model, pk_value)
+
+# Calls a lookup repeatedly and returns microseconds per call. The identity map is emptied each time so object lookups
+# load the row like a fresh request would
+def run(db, lookup, model, pk_value, calls):
+    lookup(db, model, pk_value)  # warm up the compiled cache
+    started = time.perf_counter()
+    for _ in range(calls):
+        lookup(db, model, pk_value)
+        db.expunge_all()
+    return (time.perf_counter() - started) / calls * 1e6
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print(f'{calls} calls per lookup (microseconds per call)')
+    with engine.connect() as connection:
+        db = Session(bind=connection)
+        for model in MODELS:
+            # an existing row when there is one, a missing key still measures the statement overhead
+            pk_value = db.scalar(select(func.min(get_primary_key(model)))) or 1
+            for name, before, after in (
+                ('object', query_object, get_by_primary_key),
+                ('row', query_row, prebuilt_row),
+            ):
+                built = run(db, before, model, pk_value, calls)
+                prebuilt = run(db, after, model, pk_value, calls)
+                print(f'{model.__tablename__:<20} {name:<7} built per call: {built:8.1f}  prebuilt: {prebuilt:8.1f}  '
+                      f'saved: {built - prebuilt:7.1f} ({built / prebuilt:.2f}x)')
+        db.close()
+
+if __name__ == '__main__':
+    main()
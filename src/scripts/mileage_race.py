@@ -0,0 +1,90 @@
+# Script firing parallel trip completions at one vehicle, reporting throughput and checking the odometer ends at the
+# highest trip mileage (a trip committed late with a smaller mileage must never move it back)
+# The vehicle, driver, route and trips it creates are deleted afterwards
+# usage: python3 scripts/mileage_race.py [threads] [trips per thread]
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import delete
+from db.connection import SessionLocal
+from models.driver_model import Driver
+from models.routes_model import Route
+from models.trip_logs_model import TripLog
+from models.vehicle_model import Vehicle
+from services.trip_logs_services import create_trip_log
+
+START_MILEAGE = 10000
+
+def complete_trips(vehicle_id, driver_id, route_id, trips, results, errors):
+    db = SessionLocal()
+    try:
+        for _ in range(trips):
+            mileage_end = START_MILEAGE + random.randint(1, 100000)
+            try:
+                create_trip_log(db, {
+                    'vehicle_id': vehicle_id, 'driver_id': driver_id, 'route_id': route_id,
+                    'start_time': datetime.now(), 'end_time': datetime.now(),
+                    'mileage_start': START_MILEAGE, 'mileage_end': mileage_end, 'status': 'completed',
+                })
+                results.append(mileage_end)
+            except Exception as e:
+                db.rollback()
+                errors.append(str(e))
+    finally:
+        db.close()
+
+def main():
+    threads_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    trips_per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    marker = f'RACE-{int(time.time())}'
+
+    db = SessionLocal()
+    vehicle = Vehicle(make='Mileage', model='Race', year=2024, registration_number=marker, status='active',
+                      mileage=START_MILEAGE, fuel_type='diesel')
+    driver = Driver(name='Mileage Race', license_number=marker, license_expiry_date=date(2030, 1, 1),
+                    phone_number='000', email=f'{marker.lower()}@example.com')
+    route = Route(origin='Mileage', destination='Race', distance=1.0, estimated_duration=1)
+    db.add_all([vehicle, driver, route])
+    db.commit()
+
+    results, errors = [], []
+    try:
+        threads = [
+            threading.Thread(target=complete_trips, args=(vehicle.vehicle_id, driver.driver_id, route.route_id, trips_per_thread, results, errors))
+            for _ in range(threads_count)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        final_mileage = db.query(Vehicle.mileage).filter(Vehicle.vehicle_id == vehicle.vehicle_id).scalar()
+        expected_mileage = max(results, default=START_MILEAGE)
+        print(f'{len(results)} trips from {threads_count} threads in {elapsed:.2f} s ({len(results) / elapsed:.0f} trips/s), '
+              f'{len(errors)} failed')
+        print(f'final odometer {final_mileage}, highest trip mileage {expected_mileage}')
+    finally:
+        db.execute(delete(TripLog).where(TripLog.vehicle_id == vehicle.vehicle_id))
+        db.execute(delete(Driver).where(Driver.driver_id == driver.driver_id))
+        db.execute(delete(Route).where(Route.route_id == route.route_id))
+        db.execute(delete(Vehicle).where(Vehicle.vehicle_id == vehicle.vehicle_id))
+        db.commit()
+        db.close()
+
+    if errors:
+        print('First error: ' + errors[0])
+        sys.exit(1)
+    if final_mileage != expected_mileage:
+        print('The odometer did not end at the highest trip mileage')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
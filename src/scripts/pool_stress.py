@@ -0,0 +1,46 @@
+# Script to exhaust the connection pool and report how it behaves
+# usage: python3 scripts/pool_stress.py [threads] [hold seconds]
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import exc, text
+from db.connection import engine, pool_stats, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+
+def hold_connection(hold_seconds, results):
+    try:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+            time.sleep(hold_seconds)
+        results.append('ok')
+    except exc.TimeoutError:
+        results.append('timeout')
+
+def main():
+    capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    threads_count = int(sys.argv[1]) if len(sys.argv) > 1 else capacity * 2
+    # holding connections longer than the pool timeout guarantees the threads beyond capacity time out
+    hold_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else DB_POOL_TIMEOUT + 1
+
+    results = []
+    threads = [threading.Thread(target=hold_connection, args=(hold_seconds, results)) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    time.sleep(min(hold_seconds, DB_POOL_TIMEOUT) / 2)
+    print('while saturated:', pool_stats.snapshot(engine.pool))
+    for thread in threads:
+        thread.join()
+    print('after release:  ', pool_stats.snapshot(engine.pool))
+
+    expected_timeouts = max(threads_count - capacity, 0) if hold_seconds > DB_POOL_TIMEOUT else 0
+    timeouts = results.count('timeout')
+    print(f'{threads_count} threads, capacity {capacity}: {results.count("ok")} ok, {timeouts} timed out '
+          f'(expected {expected_timeouts})')
+    # every connection must have been returned to the pool once the threads finish
+    sys.exit(0 if timeouts == expected_timeouts and engine.pool.checkedout() == 0 else 1)
+
+if __name__ == '__main__':
+    main()
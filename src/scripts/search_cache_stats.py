@@ -0,0 +1,112 @@
+# Script checking that search requests reuse compiled SQL. Each search endpoint is called with a few parameter shapes
+# (term, numeric term, filter, sort, cursor), first to warm the engine's compiled cache and then again with other
+# values of the same shapes. For the second round it reports the statements per request, how many were compiled-cache
+# hits, the time spent building the query per request and the compilation each hit saves, and fails when a repeated shape had to be compiled again.
+# The result cache is turned off so every request reaches the database, nothing is written
+# usage: python3 scripts/search_cache_stats.py [rounds]
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+os.environ['CACHE_ENABLED'] = 'false'
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT
+from app import app
+from db.connection import SessionLocal
+from routes.driver_routes import build_driver_search_query
+from routes.m_records_routes import build_maintenance_record_search_query
+from routes.routes_routes import build_route_search_query
+from routes.trip_logs_routes import build_trip_log_search_query
+from routes.vehicle_routes import build_vehicle_search_query
+
+# (endpoint, query builder, parameter shapes). Each shape is given twice with different values, the first warms the
+# compiled cache and the second must be served from it
+SEARCHES = [
+    ('/vehicles/search', build_vehicle_search_query, [
+        ({'query': 'ford'}, {'query': 'toyota'}),
+        ({'query': '12'}, {'query': '34'}),
+        ({'filter': '{"year": {"gte": 2015}}', 'sortBy': 'mileage'}, {'filter': '{"year": {"gte": 2020}}', 'sortBy': 'mileage'}),
+        ({'cursor': '', 'per_page': '5'}, {'cursor': '', 'per_page': '20'}),
+    ]),
+    ('/drivers/search', build_driver_search_query, [
+        ({'query': 'smith'}, {'query': 'jones'}),
+        ({'filter': '{"assigned_vehicle_id": [1, 2]}'}, {'filter': '{"assigned_vehicle_id": [3, 4]}'}),
+    ]),
+    ('/routes/search', build_route_search_query, [
+        ({'query': 'london'}, {'query': 'paris'}),
+        ({'filter': '{"distance": {"lt": 100}}', 'sortBy': 'origin', 'sortOrder': 'desc'},
+         {'filter': '{"distance": {"lt": 250}}', 'sortBy': 'origin', 'sortOrder': 'desc'}),
+    ]),
+    ('/trip_logs/search', build_trip_log_search_query, [
+        ({'query': 'delivery'}, {'query': 'pickup'}),
+        ({'query': 'delivery', 'mode': 'fulltext'}, {'query': 'pickup', 'mode': 'fulltext'}),
+        ({'filter': '{"start_time": {"gte": "2024-01-01T00:00:00"}}', 'sortBy': 'start_time'},
+         {'filter': '{"start_time": {"gte": "2025-01-01T00:00:00"}}', 'sortBy': 'start_time'}),
+    ]),
+    ('/maintenance/search', build_maintenance_record_search_query, [
+        ({'query': 'brake'}, {'query': 'oil'}),
+        ({'query': 'brake', 'mode': 'fulltext'}, {'query': 'oil', 'mode': 'fulltext'}),
+        ({'filter': '{"cost": {"between": [10, 500]}}'}, {'filter': '{"cost": {"between": [20, 900]}}'}),
+    ]),
+]
+
+# Counts statements and compiled cache hits of every engine (primary and replicas)
+class CacheCounter:
+    def __init__(self):
+        self.statements = 0
+        self.hits = 0
+        event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+
+    def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        self.hits += context is not None and context.cache_hit == CACHE_HIT
+
+# Microseconds per call to build a search query and compute the cache key its execution looks up, and to compile it
+# (the work a compiled cache hit skips)
+def build_times(builder, params, rounds):
+    db = SessionLocal()
+    try:
+        with app.test_request_context(query_string=params):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                query = builder(db)[0]
+                query.statement._generate_cache_key()
+            built = time.perf_counter()
+            for _ in range(rounds):
+                query.statement.compile(db.get_bind())
+            compiled = time.perf_counter()
+        return (built - started) / rounds * 1e6, (compiled - built) / rounds * 1e6
+    finally:
+        db.close()
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    client = app.test_client()
+    counter = CacheCounter()
+    recompiled = []
+
+    print(f'{"request":<60} {"statements":>10} {"cached":>7} {"build (us)":>11} {"compile (us)":>13}')
+    for endpoint, builder, shapes in SEARCHES:
+        for warm_params, params in shapes:
+            response = client.get(endpoint, query_string=warm_params)
+            if response.status_code != 200:
+                print(f'{endpoint} {warm_params}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}')
+                sys.exit(1)
+            counter.statements = counter.hits = 0
+            client.get(endpoint, query_string=params)
+            statements, hits = counter.statements, counter.hits
+            if hits < statements:
+                recompiled.append(endpoint)
+            name = endpoint + '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+            build, compile_ = build_times(builder, params, rounds)
+            print(f'{name[:60]:<60} {statements:>10} {hits:>7} {build:>11.1f} {compile_:>13.1f}')
+
+    if recompiled:
+        print('Compiled again on a repeated shape: ' + ', '.join(sorted(set(recompiled))))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
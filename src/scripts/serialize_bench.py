@@ -0,0 +1,62 @@
+# Benchmark comparing search page serialization through ORM objects and to_dict() against projected column rows
+# The rows are generated inside a transaction that is rolled back at the end
+# usage: python3 scripts/serialize_bench.py [page size] [repeats]
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from db.connection import engine
+from models.vehicle_model import Vehicle
+from utils.query_helpers import project_columns, rows_to_dicts
+
+GENERATE_VEHICLES_SQL = text("""
+    WITH RECURSIVE series(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM series WHERE n < :rows)
+    INSERT INTO vehicles (make, model, year, registration_number, status, mileage, fuel_type)
+    SELECT 'Bench', 'Serialize', 2000 + n % 25, 'BENCH-SERIALIZE-' || n, 'active', n, 'diesel' FROM series
+""")
+
+def orm_page(db, page_size):
+    vehicles = db.query(Vehicle).filter(Vehicle.make == 'Bench').order_by(Vehicle.vehicle_id).limit(page_size).all()
+    return [vehicle.to_dict() for vehicle in vehicles]
+
+def projected_page(db, page_size):
+    query = db.query(Vehicle).filter(Vehicle.make == 'Bench').order_by(Vehicle.vehicle_id).limit(page_size)
+    return rows_to_dicts(project_columns(query, Vehicle).all(), Vehicle)
+
+# Runs a page function repeatedly in fresh sessions and returns rows per second, serialization to JSON included
+def run(connection, page, page_size, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        db = Session(bind=connection)
+        json.dumps(page(db, page_size), default=str)
+        db.close()
+    return page_size * repeats / (time.perf_counter() - started)
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.execute(GENERATE_VEHICLES_SQL, {'rows': page_size})
+            # warm up both paths so statement compilation is not measured
+            run(connection, orm_page, page_size, 1)
+            run(connection, projected_page, page_size, 1)
+
+            orm_rate = run(connection, orm_page, page_size, repeats)
+            projected_rate = run(connection, projected_page, page_size, repeats)
+        finally:
+            transaction.rollback()
+
+    print(f'{page_size}-row pages, {repeats} repeats')
+    print(f'ORM objects + to_dict(): {orm_rate:10.0f} rows/s')
+    print(f'projected column rows:   {projected_rate:10.0f} rows/s ({projected_rate / orm_rate:.2f}x)')
+
+if __name__ == '__main__':
+    main()
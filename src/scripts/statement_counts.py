@@ -0,0 +1,116 @@
+# Script counting the SQL statements each create/update/delete service issues, so extra round trips are caught
+# Everything runs inside a transaction that is rolled back at the end, the database is left untouched
+# usage: python3 scripts/statement_counts.py
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from db.connection import engine
+from services.vehicle_services import create_vehicle, update_vehicle, delete_vehicle
+from services.driver_services import create_driver, update_driver
+from services.routes_services import create_route
+from services.trip_logs_services import create_trip_log, update_trip_log, delete_trip_log
+from services.m_records_services import create_maintenance_record, update_maintenance_record
+
+# Most statements each call may issue (commits are not statements, they end the round trip of the last one)
+BUDGETS = {
+    'create_vehicle': 1,                  # INSERT ... RETURNING
+    'create_route': 1,
+    'create_driver': 2,                   # reference check + INSERT ... RETURNING
+    'create_trip_log': 2,
+    'create_trip_log (completed)': 3,     # reference check + INSERT ... RETURNING + conditional odometer UPDATE
+    'create_maintenance_record': 2,
+    'create_trip_log (missing vehicle)': 1,
+    'update_vehicle': 2,                  # SELECT + UPDATE ... RETURNING
+    'update_driver': 2,
+    'update_trip_log': 2,
+    'update_trip_log (new vehicle)': 3,   # SELECT + reference check + UPDATE ... RETURNING
+    'update_maintenance_record': 2,
+    'delete_trip_log': 2,                 # SELECT + DELETE
+    'delete_vehicle': 2,
+}
+
+class StatementCounter:
+    def __init__(self, connection):
+        self.count = 0
+        event.listen(connection, 'before_cursor_execute', self.before_cursor_execute)
+
+    # savepoints stand in for the commits of the services and are not counted
+    def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+            self.count += 1
+
+def main():
+    results = {}
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        counter = StatementCounter(connection)
+        db = Session(bind=connection, join_transaction_mode='create_savepoint', autoflush=False, expire_on_commit=False)
+
+        def measure(name, call):
+            db.expunge_all()
+            counter.count = 0
+            try:
+                result = call()
+            except ValueError:
+                db.rollback()
+                result = None
+            results[name] = counter.count
+            return result
+
+        try:
+            vehicle = measure('create_vehicle', lambda: create_vehicle(db, {
+                'make': 'Statement', 'model': 'Count', 'year': 2020, 'registration_number': 'STMT-COUNT-1',
+                'status': 'active', 'mileage': 1000, 'fuel_type': 'diesel',
+            }))
+            other_vehicle = create_vehicle(db, {
+                'make': 'Statement', 'model': 'Count', 'year': 2021, 'registration_number': 'STMT-COUNT-2',
+                'status': 'active', 'mileage': 500, 'fuel_type': 'diesel',
+            })
+            route = measure('create_route', lambda: create_route(db, {
+                'origin': 'Statement', 'destination': 'Count', 'distance': 12.5, 'estimated_duration': 20,
+            }))
+            driver = measure('create_driver', lambda: create_driver(db, {
+                'name': 'Statement Count', 'license_number': 'STMT-COUNT', 'license_expiry_date': date(2030, 1, 1),
+                'phone_number': '000', 'email': 'statement.count@example.com', 'assigned_vehicle_id': vehicle.vehicle_id,
+            }))
+            trip = {
+                'vehicle_id': vehicle.vehicle_id, 'driver_id': driver.driver_id, 'route_id': route.route_id,
+                'start_time': datetime(2024, 1, 1, 8), 'mileage_start': 1000, 'status': 'completed',
+            }
+            trip_log = measure('create_trip_log', lambda: create_trip_log(db, trip))
+            measure('create_trip_log (completed)', lambda: create_trip_log(db, {**trip, 'mileage_end': 1100}))
+            measure('create_trip_log (missing vehicle)', lambda: create_trip_log(db, {**trip, 'vehicle_id': -1}))
+            record = measure('create_maintenance_record', lambda: create_maintenance_record(db, {
+                'vehicle_id': vehicle.vehicle_id, 'driver_id': driver.driver_id, 'maintenance_type': 'service',
+                'cost': 100, 'maintenance_date': date(2024, 1, 2),
+            }))
+
+            measure('update_vehicle', lambda: update_vehicle(db, vehicle.vehicle_id, {'status': 'inactive'}))
+            measure('update_driver', lambda: update_driver(db, driver.driver_id, {'phone_number': '111'}))
+            measure('update_trip_log', lambda: update_trip_log(db, trip_log.trip_id, {'notes': 'counted'}))
+            measure('update_trip_log (new vehicle)', lambda: update_trip_log(db, trip_log.trip_id, {'vehicle_id': other_vehicle.vehicle_id}))
+            measure('update_maintenance_record', lambda: update_maintenance_record(db, record.maintenance_id, {'cost': 120}))
+            measure('delete_trip_log', lambda: delete_trip_log(db, trip_log.trip_id))
+            measure('delete_vehicle', lambda: delete_vehicle(db, other_vehicle.vehicle_id))
+        finally:
+            db.close()
+            transaction.rollback()
+
+    over_budget = []
+    for name, count in results.items():
+        budget = BUDGETS[name]
+        print(f'{name:<36} {count} statement(s), budget {budget}')
+        if count > budget:
+            over_budget.append(name)
+
+    if over_budget:
+        print('Over budget: ' + ', '.join(over_budget))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
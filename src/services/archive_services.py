@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, column, delete, insert, select, table, tuple_
+from sqlalchemy.orm import Session
+from models.trip_logs_model import TripLog
+from models.m_records_model import MaintenanceRecord
+from utils.cache import bump_version
+from utils.query_helpers import model_columns
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Archiving settings: completed trips that started more than ARCHIVE_TRIP_LOGS_AFTER_DAYS ago and maintenance records
+# older than ARCHIVE_MAINTENANCE_RECORDS_AFTER_DAYS move to the archive tables, ARCHIVE_BATCH_SIZE rows per transaction
+# with a pause of ARCHIVE_BATCH_PAUSE seconds between batches so live writes and autovacuum keep up
+ARCHIVE_TRIP_LOGS_AFTER_DAYS = int(os.getenv('ARCHIVE_TRIP_LOGS_AFTER_DAYS', 365))
+ARCHIVE_MAINTENANCE_RECORDS_AFTER_DAYS = int(os.getenv('ARCHIVE_MAINTENANCE_RECORDS_AFTER_DAYS', 730))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 1000))
+ARCHIVE_BATCH_PAUSE = float(os.getenv('ARCHIVE_BATCH_PAUSE', 0.1))
+
+# Schema of the views combining each table with its archive table (migration b3d9f2c8e5a1)
+ARCHIVE_SCHEMA = 'with_archive'
+
+# Runs a query against the with_archive views, so searches and exports read archived rows too. The views carry the
+# tables' names and columns, the query itself is unchanged
+def include_archived(query):
+    return query.execution_options(schema_translate_map={None: ARCHIVE_SCHEMA})
+
+def _archive_table(model):
+    return table(f'{model.__tablename__}_archive', *[column(c.name) for c in model_columns(model)])
+
+# Moves up to batch_size of the oldest rows matching the condition into the model's archive table in one statement:
+# a DELETE ... RETURNING feeding an INSERT, so a row is never in both tables or in neither. Rows locked by another
+# transaction are skipped and left for the next run. Returns how many rows moved
+def _archive_batch(db: Session, model, condition, order_by, batch_size):
+    pk_columns = list(model.__table__.primary_key.columns)
+    batch = (
+        select(*pk_columns)
+        .where(condition)
+        .order_by(order_by)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    columns = model_columns(model)
+    moved = delete(model.__table__).where(tuple_(*pk_columns).in_(batch)).returning(*columns).cte('moved')
+    result = db.execute(
+        insert(_archive_table(model)).from_select(
+            [c.name for c in columns],
+            select(*[moved.c[c.name] for c in columns]),
+        )
+    )
+    return result.rowcount
+
+# Archives matching rows batch by batch, committing each batch, until a batch comes back short. Returns the total moved
+def _archive_rows(db: Session, model, entity, condition, order_by, batch_size, pause):
+    total = 0
+    while True:
+        moved = _archive_batch(db, model, condition, order_by, batch_size)
+        db.commit()
+        total += moved
+        if moved:
+            bump_version(entity)
+        if moved < batch_size:
+            return total
+        time.sleep(pause)
+
+# Function to archive completed trips older than the given age
+def archive_trip_logs(db: Session, older_than_days=ARCHIVE_TRIP_LOGS_AFTER_DAYS,
+                      batch_size=ARCHIVE_BATCH_SIZE, pause=ARCHIVE_BATCH_PAUSE):
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    condition = and_(TripLog.start_time < cutoff, TripLog.status == 'completed')
+    return _archive_rows(db, TripLog, 'trip_logs', condition, TripLog.start_time, batch_size, pause)
+
+# Function to archive maintenance records older than the given age
+def archive_maintenance_records(db: Session, older_than_days=ARCHIVE_MAINTENANCE_RECORDS_AFTER_DAYS,
+                                batch_size=ARCHIVE_BATCH_SIZE, pause=ARCHIVE_BATCH_PAUSE):
+    cutoff = date.today() - timedelta(days=older_than_days)
+    condition = MaintenanceRecord.maintenance_date < cutoff
+    return _archive_rows(db, MaintenanceRecord, 'maintenance_records', condition, MaintenanceRecord.maintenance_date,
+                         batch_size, pause)
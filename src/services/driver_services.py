@@ -1,36 +1,38 @@
 from sqlalchemy.orm import Session
 from models.driver_model import Driver
 from models.vehicle_model import Vehicle
+from utils.cache import bump_version
+from utils.references import checked_references, forget_references
+from utils.query_helpers import get_by_primary_key
+
+# The vehicle a driver is assigned to
+def driver_references(data: dict):
+    return [(Vehicle.vehicle_id, data.get('assigned_vehicle_id'), 'Assigned vehicle does not exist.')]
 
 # Function to create a new driver
 def create_driver(db: Session, data: dict):
-    # Validate the assigned vehicle ID if provided
-    assigned_vehicle_id = data.get('assigned_vehicle_id')
-
-    if assigned_vehicle_id:
-        assigned_vehicle = db.query(Vehicle).filter_by(vehicle_id=assigned_vehicle_id).first()
-        if not assigned_vehicle:
-            raise ValueError('Assigned vehicle does not exist.')
-
-    new_driver = Driver(**data)
-    db.add(new_driver)
-    db.commit()
-    db.refresh(new_driver)
+    # Validate the assigned vehicle ID if provided, the INSERT returns the generated ID and timestamps
+    with checked_references(db, driver_references(data)):
+        new_driver = Driver(**data)
+        db.add(new_driver)
+        db.commit()
+    bump_version('drivers')
     return new_driver
  
 # Function to retrieve a driver by ID
 def get_driver(db: Session, driver_id: int):
-    return db.query(Driver).filter(Driver.driver_id == driver_id).first()
+    return get_by_primary_key(db, Driver, driver_id)
 
 # Function to update a driver's details
 def update_driver(db: Session, driver_id: int, data: dict):
     driver = get_driver(db, driver_id)
     if not driver:
         return None  # Return None if driver is not found
-    for key, value in data.items():
-        setattr(driver, key, value)
-    db.commit()
-    db.refresh(driver)
+    with checked_references(db, driver_references(data)):
+        for key, value in data.items():
+            setattr(driver, key, value)
+        db.commit()
+    bump_version('drivers')
     return driver
 
 # Function to delete a driver
@@ -39,4 +41,6 @@ def delete_driver(db: Session, driver_id: int):
     if driver:
         db.delete(driver)
         db.commit()
+        bump_version('drivers')
+        forget_references('drivers')
     return driver
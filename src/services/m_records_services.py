@@ -2,35 +2,42 @@ from sqlalchemy.orm import Session
 from models.m_records_model import MaintenanceRecord
 from models.vehicle_model import Vehicle
 from models.driver_model import Driver
+from utils.bulk import bulk_insert
+from utils.cache import bump_version
+from utils.references import checked_references
+from utils.query_helpers import get_by_primary_key
+
+# The vehicle and driver a maintenance record points at, checked in one query
+def maintenance_record_references(data: dict):
+    return [
+        (Vehicle.vehicle_id, data.get('vehicle_id'), 'Assigned vehicle does not exist.'),
+        (Driver.driver_id, data.get('driver_id'), 'Assigned driver does not exist.'),
+    ]
 
 # Function to create a new maintenance record
 def create_maintenance_record(db: Session, data: dict):
-    # Validate vehicle and driver IDs
-    vehicle_id = data.get('vehicle_id')
-    driver_id = data.get('driver_id')
-
-    # Ensure vehicle exists
-    if vehicle_id:
-        vehicle = db.query(Vehicle).filter_by(vehicle_id=vehicle_id).first()
-        if not vehicle:
-            raise ValueError('Assigned vehicle does not exist.')
-
-    # Ensure driver exists
-    if driver_id:
-        driver = db.query(Driver).filter_by(driver_id=driver_id).first()
-        if not driver:
-            raise ValueError('Assigned driver does not exist.')
-
-    # Create new maintenance record
-    new_record = MaintenanceRecord(**data)
-    db.add(new_record)
-    db.commit()
-    db.refresh(new_record)
+    # Ensure the vehicle and driver exist, then create the record; the INSERT returns the generated ID and timestamps
+    with checked_references(db, maintenance_record_references(data)):
+        new_record = MaintenanceRecord(**data)
+        db.add(new_record)
+        db.commit()
+    bump_version('maintenance_records')
     return new_record
 
+# Function to create many maintenance records in one transaction, returns a result per item
+def create_maintenance_records_bulk(db: Session, items: list):
+    results, created = bulk_insert(db, MaintenanceRecord, items, [
+        (Vehicle.vehicle_id, 'vehicle_id', 'Assigned vehicle does not exist.'),
+        (Driver.driver_id, 'driver_id', 'Assigned driver does not exist.'),
+    ])
+    db.commit()
+    if created:
+        bump_version('maintenance_records')
+    return results
+
 # Function to retrieve a maintenance record by ID
 def get_maintenance_record(db: Session, record_id: int):
-    return db.query(MaintenanceRecord).filter(MaintenanceRecord.maintenance_id == record_id).first()
+    return get_by_primary_key(db, MaintenanceRecord, record_id)
 
 # Function to update a maintenance record
 def update_maintenance_record(db: Session, record_id: int, data: dict):
@@ -38,12 +45,13 @@ def update_maintenance_record(db: Session, record_id: int, data: dict):
     if not record:
         return None
 
-    # Update record attributes
-    for key, value in data.items(): 
-        setattr(record, key, value)
+    # Update record attributes once the vehicle and driver are known to exist
+    with checked_references(db, maintenance_record_references(data)):
+        for key, value in data.items():
+            setattr(record, key, value)
+        db.commit()
 
-    db.commit()
-    db.refresh(record)
+    bump_version('maintenance_records')
     return record
 
 # Function to delete a maintenance record
@@ -52,4 +60,5 @@ def delete_maintenance_record(db: Session, record_id: int):
     if record:
         db.delete(record)
         db.commit()
+        bump_version('maintenance_records')
     return record
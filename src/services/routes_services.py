@@ -1,17 +1,20 @@
 from sqlalchemy.orm import Session
 from models.routes_model import Route
+from utils.cache import bump_version
+from utils.references import forget_references
+from utils.query_helpers import get_by_primary_key
 
 # Function to create a new route
 def create_route(db: Session, data: dict):
     new_route = Route(**data)
     db.add(new_route)
     db.commit()
-    db.refresh(new_route)
+    bump_version('routes')
     return new_route
 
 # Function to retrieve a route by ID
 def get_route(db: Session, route_id: int):
-    return db.query(Route).filter(Route.route_id == route_id).first()
+    return get_by_primary_key(db, Route, route_id)
 
 # Function to update a route's details
 def update_route(db: Session, route_id: int, data: dict):
@@ -21,7 +24,7 @@ def update_route(db: Session, route_id: int, data: dict):
     for key, value in data.items():
         setattr(route, key, value) 
     db.commit()
-    db.refresh(route)
+    bump_version('routes')
     return route
 
 # Function to delete a route
@@ -30,4 +33,6 @@ def delete_route(db: Session, route_id: int):
     if route:
         db.delete(route)
         db.commit()
+        bump_version('routes')
+        forget_references('routes')
     return route
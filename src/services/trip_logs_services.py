@@ -1,43 +1,88 @@
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from models.trip_logs_model import TripLog
 from models.vehicle_model import Vehicle
 from models.driver_model import Driver
+from models.routes_model import Route
+from utils.bulk import bulk_insert
+from utils.cache import bump_version
+from utils.references import checked_references
+from utils.query_helpers import get_by_primary_key
+
+# The vehicle, driver and route a trip log points at, checked in one query
+def trip_log_references(data: dict):
+    return [
+        (Vehicle.vehicle_id, data.get('vehicle_id'), 'Assigned vehicle does not exist.'),
+        (Driver.driver_id, data.get('driver_id'), 'Assigned driver does not exist.'),
+        (Route.route_id, data.get('route_id'), 'Assigned route does not exist.'),
+    ]
+
+# Moves a vehicle's odometer forward to the mileage at the end of a trip with one conditional UPDATE in the caller's
+# transaction. A smaller value (an older or concurrent trip) leaves it untouched; returns whether it moved
+def advance_vehicle_mileage(db: Session, vehicle_id: int, mileage_end):
+    if not mileage_end:
+        return False
+    result = db.execute(
+        update(Vehicle)
+        .where(Vehicle.vehicle_id == vehicle_id, Vehicle.mileage < mileage_end)
+        .values(mileage=mileage_end)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
 
 # Function to create a new trip log
 def create_trip_log(db: Session, data: dict):
-    # Validate the vehicle and driver IDs if provided
-    assigned_vehicle_id = data.get('vehicle_id')
-    assigned_driver_id = data.get('driver_id')
-
-    if assigned_vehicle_id:
-        assigned_vehicle = db.query(Vehicle).filter_by(vehicle_id=assigned_vehicle_id).first()
-        if not assigned_vehicle:
-            raise ValueError('Assigned vehicle does not exist.')
-
-    if assigned_driver_id:
-        assigned_driver = db.query(Driver).filter_by(driver_id=assigned_driver_id).first()
-        if not assigned_driver:
-            raise ValueError('Assigned driver does not exist.')
-
-    new_trip_log = TripLog(**data)
-    db.add(new_trip_log)
-    db.commit()
-    db.refresh(new_trip_log)
+    # Validate the vehicle, driver and route IDs if provided. The INSERT returns the generated ID and timestamps,
+    # the odometer moves in the same transaction
+    with checked_references(db, trip_log_references(data)):
+        new_trip_log = TripLog(**data)
+        db.add(new_trip_log)
+        mileage_moved = advance_vehicle_mileage(db, new_trip_log.vehicle_id, new_trip_log.mileage_end)
+        db.commit()
+    bump_version('trip_logs')
+    if mileage_moved:
+        bump_version('vehicles')
     return new_trip_log
 
+# Function to create many trip logs in one transaction, returns a result per item.
+# Each vehicle's odometer is moved forward once, to the highest mileage_end of its created trips
+def create_trip_logs_bulk(db: Session, items: list):
+    results, created = bulk_insert(db, TripLog, items, [
+        (Vehicle.vehicle_id, 'vehicle_id', 'Assigned vehicle does not exist.'),
+        (Driver.driver_id, 'driver_id', 'Assigned driver does not exist.'),
+        (Route.route_id, 'route_id', 'Assigned route does not exist.'),
+    ])
+
+    mileage = {}
+    for _, item in created:
+        if item.get('mileage_end'):
+            mileage[item['vehicle_id']] = max(mileage.get(item['vehicle_id'], 0), item['mileage_end'])
+    mileage_moved = [advance_vehicle_mileage(db, vehicle_id, value) for vehicle_id, value in mileage.items()]
+
+    db.commit()
+    if created:
+        bump_version('trip_logs')
+    if any(mileage_moved):
+        bump_version('vehicles')
+    return results
+
 # Function to retrieve a trip log by ID
 def get_trip_log(db: Session, trip_id: int):
-    return db.query(TripLog).filter(TripLog.trip_id == trip_id).first()
+    return get_by_primary_key(db, TripLog, trip_id)
 
 # Function to update a trip log's details
 def update_trip_log(db: Session, trip_id: int, data: dict):
     trip_log = get_trip_log(db, trip_id)
     if not trip_log:
         return None  # Return None if trip log is not found
-    for key, value in data.items():
-        setattr(trip_log, key, value)
-    db.commit()
-    db.refresh(trip_log)
+    with checked_references(db, trip_log_references(data)):
+        for key, value in data.items():
+            setattr(trip_log, key, value)
+        mileage_moved = advance_vehicle_mileage(db, trip_log.vehicle_id, trip_log.mileage_end)
+        db.commit()
+    bump_version('trip_logs')
+    if mileage_moved:
+        bump_version('vehicles')
     return trip_log
 
 # Function to delete a trip log
@@ -46,4 +91,5 @@ def delete_trip_log(db: Session, trip_id: int):
     if trip_log:
         db.delete(trip_log)
         db.commit()
+        bump_version('trip_logs')
     return trip_log
\ No newline at end of file
@@ -1,17 +1,29 @@
 from sqlalchemy.orm import Session
 from models.vehicle_model import Vehicle
+from utils.bulk import bulk_insert
+from utils.cache import bump_version
+from utils.references import forget_references
+from utils.query_helpers import get_by_primary_key
 
 # Function to create new vehicle
 def create_vehicle(db: Session, data: dict):
     new_vehicle = Vehicle(**data)
     db.add(new_vehicle)
     db.commit()
-    db.refresh(new_vehicle)
+    bump_version('vehicles')
     return new_vehicle
 
+# Function to create many vehicles in one transaction, returns a result per item
+def create_vehicles_bulk(db: Session, items: list):
+    results, created = bulk_insert(db, Vehicle, items)
+    db.commit()
+    if created:
+        bump_version('vehicles')
+    return results
+
 # Function to return vehicle by vehicle ID
 def get_vehicle(db: Session, vehicle_id: int):
-    return db.query(Vehicle).filter(Vehicle.vehicle_id == vehicle_id).first()
+    return get_by_primary_key(db, Vehicle, vehicle_id)
 
 # not functional as the query logic is implemented in the search function in the routes file
 # # Retrieve all vehicles in DB with pages
@@ -25,7 +37,7 @@ def update_vehicle(db: Session, vehicle_id: int, data: dict):
         for key, value in data.items():
             setattr(vehicle, key, value)
         db.commit()
-        db.refresh(vehicle)
+        bump_version('vehicles')
     return vehicle
 
 # Function for deletion of entry
@@ -34,4 +46,6 @@ def delete_vehicle(db: Session, vehicle_id = int):
     if vehicle:
         db.delete(vehicle)
         db.commit()
+        bump_version('vehicles')
+        forget_references('vehicles')
     return vehicle
\ No newline at end of file
@@ -0,0 +1,134 @@
+# bulk.py
+import json
+import os
+from flask import request
+from sqlalchemy import inspect, insert
+from sqlalchemy.exc import StatementError
+from utils.query_helpers import coerce_column_value
+from utils.references import existing_references
+
+# Most items one bulk request may carry
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', 1000))
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# Stands in for an NDJSON line that could not be parsed, so the other lines are still processed
+class InvalidItem:
+    def __init__(self, message):
+        self.message = message
+
+# Reads the items of a bulk request, either a JSON array or one JSON object per line (NDJSON)
+def parse_bulk_items():
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line_number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(InvalidItem(f'Line {line_number} is not valid JSON.'))
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            raise ValueError('Expected a JSON array or NDJSON lines of items.')
+
+    if not items:
+        raise ValueError('No items to create.')
+    if len(items) > BULK_MAX_ITEMS:
+        raise ValueError(f'At most {BULK_MAX_ITEMS} items can be created at once.')
+    return items
+
+# Checks the shape of one item against the model's columns, returning an error message or None.
+# Values are converted in place by coerce_column_value() (ISO date and timestamp strings, numeric and digit strings),
+# so a malformed value is reported before the INSERT and the caller can rely on the item's types
+def _item_error(item, columns, required):
+    if isinstance(item, InvalidItem):
+        return item.message
+    if not isinstance(item, dict):
+        return 'Item must be a JSON object.'
+    for key, value in item.items():
+        column = columns.get(key)
+        if column is None:
+            return f"Unknown field '{key}'."
+        if value is None:
+            continue
+        try:
+            item[key] = coerce_column_value(column, value)
+        except ValueError as e:
+            return f"'{key}' must be {e}."
+    for key in required:
+        if item.get(key) is None:
+            return f"Missing required field '{key}'."
+    return None
+
+# Database error message without the statement and parameters SQLAlchemy appends
+def _database_error(e):
+    return str(e.orig).strip().splitlines()[0] if e.orig is not None else str(e)
+
+# Validates a batch and inserts the valid items with multi-row INSERTs in the current transaction.
+# references is a list of (primary key column, item key, message) checked with one query per referenced table.
+# Returns one result per item, {'index', <primary key>} when created or {'index', 'error'} when rejected, and the
+# created (index, item) pairs; the caller commits
+def bulk_insert(db, model, items, references=()):
+    mapper = inspect(model)
+    primary_key = mapper.primary_key[0]
+    columns = {attribute.key: attribute.columns[0] for attribute in mapper.column_attrs if attribute.columns[0] is not primary_key}
+    required = [
+        key for key, column in columns.items()
+        if not column.nullable and column.default is None and column.server_default is None
+    ]
+
+    errors = {}
+    for index, item in enumerate(items):
+        error = _item_error(item, columns, required)
+        if error:
+            errors[index] = error
+
+    # every referenced ID of the batch is looked up at once per table
+    for column, key, message in references:
+        values = set()
+        for index, item in enumerate(items):
+            value = item.get(key) if index not in errors else None
+            if value is None:
+                continue
+            if not isinstance(value, int) or isinstance(value, bool):
+                errors[index] = f"'{key}' must be an integer."
+            else:
+                values.add(value)
+        existing = existing_references(db, column, values)
+        for index, item in enumerate(items):
+            if index not in errors and item.get(key) is not None and item[key] not in existing:
+                errors[index] = message
+
+    valid = [(index, item) for index, item in enumerate(items) if index not in errors]
+    created_ids = {}
+    if valid:
+        statement = insert(model).returning(primary_key, sort_by_parameter_order=True)
+        try:
+            with db.begin_nested():
+                ids = db.scalars(statement, [item for _, item in valid]).all()
+            created_ids = {index: id_ for (index, _), id_ in zip(valid, ids)}
+        except StatementError:
+            # a value the database rejects (bad type, duplicate key) fails the whole statement,
+            # retry item by item so only the offending items are reported
+            for index, item in valid:
+                try:
+                    with db.begin_nested():
+                        created_ids[index] = db.scalars(statement, [item]).one()
+                except StatementError as e:
+                    errors[index] = _database_error(e)
+
+    results = [
+        {'index': index, 'error': errors[index]} if index in errors else {'index': index, primary_key.name: created_ids[index]}
+        for index in range(len(items))
+    ]
+    created = [(index, items[index]) for index in sorted(created_ids)]
+    return results, created
+
+# Status of a bulk response: 201 when every item was created, 207 when some were, 400 when none were
+def bulk_status(results):
+    failed = sum(1 for result in results if 'error' in result)
+    if not failed:
+        return 201
+    return 207 if failed < len(results) else 400
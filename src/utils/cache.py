@@ -0,0 +1,194 @@
+# cache.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import g, request
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Cache settings, entries expire after CACHE_TTL seconds and the in-process cache holds CACHE_MAX_ENTRIES responses
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() != 'false'
+CACHE_TTL = int(os.getenv('CACHE_TTL', 30))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+# Optional shared backend (e.g. redis://localhost:6379/0) so every worker process sees the same entries and versions
+CACHE_URL = os.getenv('CACHE_URL')
+
+# In-process LRU cache with per-entry expiry
+class MemoryCacheBackend:
+    shared = False  # entries and versions are only seen by this process
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._counters = {}  # version counters and write times are kept outside the LRU so they are never evicted
+        self._stamps = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def stamp(self, key):
+        with self._lock:
+            self._stamps[key] = time.time()
+
+    def stamped_at(self, key):
+        with self._lock:
+            return self._stamps.get(key)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'evictions': self.evictions}
+
+# Shared cache stored in Redis, entries and version counters are visible to every worker process
+class RedisCacheBackend:
+    shared = True
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed when CACHE_URL is set
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, json.dumps(value), ex=ttl)
+
+    def counter(self, key):
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+    def stamp(self, key):
+        self._client.set(key, time.time())
+
+    def stamped_at(self, key):
+        value = self._client.get(key)
+        return float(value) if value is not None else None
+
+    def stats(self):
+        info = self._client.info('stats')
+        return {'entries': self._client.dbsize(), 'evictions': info.get('evicted_keys', 0)}
+
+# Caches responses per entity; every entity has a version counter that writes bump, which retires all older entries
+class ResultCache:
+    def __init__(self, backend, ttl=CACHE_TTL, enabled=CACHE_ENABLED):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def version(self, entity):
+        return self.backend.counter(f'version:{entity}')
+
+    def bump_version(self, entity):
+        self.backend.stamp(f'written:{entity}')
+        return self.backend.incr(f'version:{entity}')
+
+    # Whether the entity was written in the last given seconds
+    def written_within(self, entity, seconds):
+        written_at = self.backend.stamped_at(f'written:{entity}')
+        return written_at is not None and time.time() - written_at < seconds
+
+    # Builds a key from the entity version, the endpoint and its parameters in a stable order
+    def make_key(self, entity, endpoint, params):
+        normalized = json.dumps(sorted(params), separators=(',', ':'))
+        return f'{entity}:{self.version(entity)}:{endpoint}:{normalized}'
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+        stats.update(self.backend.stats())
+        return stats
+
+result_cache = ResultCache(RedisCacheBackend(CACHE_URL) if CACHE_URL else MemoryCacheBackend())
+
+# Marks every cached result for an entity as stale, called by the service layer after each write
+def bump_version(entity):
+    result_cache.bump_version(entity)
+
+# Normalised request parameters: path arguments plus every query string value. Empty values are kept, a present but
+# empty parameter can change the response (an empty cursor selects keyset pagination)
+def request_params():
+    params = [(key, str(value)) for key, value in (request.view_args or {}).items()]
+    params += [(key, value) for key, values in request.args.lists() for value in values]
+    return params
+
+# Decorator caching successful JSON responses of read endpoints for the given entity
+def cached(entity):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not result_cache.enabled:
+                return f(*args, **kwargs)
+            key = result_cache.make_key(entity, request.endpoint, request_params())
+            cached_response = result_cache.get(key)
+            if cached_response is not None:
+                return cached_response['body'], 200, {'Content-Type': cached_response['content_type'], 'X-Cache': 'HIT'}
+
+            response = f(*args, **kwargs)
+            # only plain 200 responses are cached, error tuples and rendered pages pass straight through
+            cacheable = getattr(response, 'status_code', None) == 200 and response.is_json
+            # a replica read shortly after a write may predate it, caching it would outlive the version bump
+            replica_lag = g.get('db_replica_max_lag')
+            if cacheable and replica_lag and result_cache.written_within(entity, replica_lag):
+                cacheable = False
+            if cacheable:
+                result_cache.set(key, {'body': response.get_data(as_text=True), 'content_type': response.content_type})
+            return response
+        return decorated_function
+    return decorator
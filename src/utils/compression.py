@@ -0,0 +1,154 @@
+# compression.py
+import os
+import re
+import zlib
+from flask import g, request
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Compression settings: responses smaller than COMPRESSION_MIN_SIZE bytes are sent as they are, streamed responses
+# (exports) are always compressed. Higher levels trade CPU for bandwidth
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() != 'false'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))       # 1-9
+COMPRESSION_BROTLI_LEVEL = int(os.getenv('COMPRESSION_BROTLI_LEVEL', 4))   # 0-11
+COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))       # 1-22
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+# brotli and zstandard are optional dependencies, without them only gzip is offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Each compressor takes chunks through compress(), flush() sends what it has buffered so far as a complete block the
+# client can decode straight away, and finish() ends the stream
+class GzipCompressor:
+    def __init__(self):
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+class BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_LEVEL)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+class ZstdCompressor:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+# Available encodings in the order preferred when the client accepts several equally
+COMPRESSORS = {
+    name: compressor for name, compressor, available in (
+        ('zstd', ZstdCompressor, zstandard is not None),
+        ('br', BrotliCompressor, brotli is not None),
+        ('gzip', GzipCompressor, True),
+    ) if available
+}
+
+# A compressed body is a different representation, so its strong ETag carries the encoding as a suffix
+ETAG_ENCODING_SUFFIX = re.compile(r'-(' + '|'.join(COMPRESSORS) + r')"')
+
+# Picks the encoding for this request from Accept-Encoding, or None for an uncompressed response
+def negotiate_encoding():
+    return request.accept_encodings.best_match(list(COMPRESSORS))
+
+def compress_body(data, encoding):
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(data) + compressor.finish()
+
+# Compresses a streamed body chunk by chunk, flushing after each so every export batch reaches the client as soon as
+# it is produced. The wrapped iterable is closed however the stream ends, which releases an export's connection
+def compress_stream(chunks, encoding):
+    compressor = COMPRESSORS[encoding]()
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+# Conditional requests carry the ETag of the representation the client holds, the encoding suffix is removed so views
+# compare against their own tag, and remembered so a 304 answers with the tag the client sent
+def _strip_etag_encoding():
+    if_none_match = request.environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        match = ETAG_ENCODING_SUFFIX.search(if_none_match)
+        if match:
+            g.etag_encoding = match.group(1)
+            request.environ['HTTP_IF_NONE_MATCH'] = ETAG_ENCODING_SUFFIX.sub('"', if_none_match)
+
+def _tag_encoding(response, encoding):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+
+def _compress_response(response):
+    if response.status_code == 304:
+        if g.get('etag_encoding'):
+            _tag_encoding(response, g.etag_encoding)
+        return response
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.status_code < 200
+            or response.status_code in (204, 206) or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    _tag_encoding(response, encoding)
+    return response
+
+# Negotiates gzip, brotli or zstd compression for JSON, NDJSON and CSV responses
+def init_compression(app):
+    if COMPRESSION_ENABLED:
+        app.before_request(_strip_etag_encoding)
+        app.after_request(_compress_response)
@@ -0,0 +1,69 @@
+# conditional.py
+import hashlib
+import json
+from datetime import timezone
+from functools import lru_cache, wraps
+from flask import make_response, request
+from sqlalchemy import bindparam, func, select
+from werkzeug.http import is_resource_modified
+from utils.cache import request_params, result_cache
+from utils.query_helpers import get_primary_key
+
+# Strong ETag over the validator values and the request parameters, so each fieldset or page has its own tag
+def _make_etag(*validators):
+    payload = json.dumps([request.endpoint, sorted(request_params()), *validators], default=str, separators=(',', ':'))
+    return hashlib.sha1(payload.encode()).hexdigest()[:32]
+
+# updated_at is stored without a time zone, HTTP dates need one
+def _last_modified(updated_at):
+    return updated_at.replace(tzinfo=timezone.utc) if updated_at is not None else None
+
+# Answers If-None-Match / If-Modified-Since with 304 when the validators match, otherwise runs the view and tags its response
+def _conditional_response(f, args, kwargs, etag, last_modified):
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(f(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True  # clients revalidate every time, which is a cheap query when unchanged
+    return response
+
+# Single-column updated_at lookup by primary key, built once per model
+@lru_cache(maxsize=None)
+def _updated_at_statement(model):
+    return select(model.updated_at).where(get_primary_key(model) == bindparam('pk'))
+
+# Decorator for views returning one row: the ETag and Last-Modified come from the row's updated_at, read with a
+# single-column lookup before the full row is loaded. Expects the session as the view's first argument
+def conditional_row(model):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(db, *args, **kwargs):
+            pk_value = next(iter(request.view_args.values()))
+            updated_at = db.execute(_updated_at_statement(model), {'pk': pk_value}).scalar()
+            if updated_at is None:
+                return f(db, *args, **kwargs)  # not found, the view answers
+            etag = _make_etag(model.__tablename__, pk_value, updated_at)
+            return _conditional_response(f, (db, *args), kwargs, etag, _last_modified(updated_at))
+        return decorated_function
+    return decorator
+
+# Decorator for search pages: the ETag comes from the table's max(updated_at), served by its index, and the entity's
+# cache version, which writes bump (so deletes, which leave max(updated_at) alone, still change the tag).
+# Pages carry no Last-Modified for the same reason, a delete would not move it. The version has to be shared by every
+# process writing the table (workers, the archiving job), so without a shared cache backend (CACHE_URL) pages get
+# no ETag rather than one a delete elsewhere would not change
+def conditional_table(model, entity):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(db, *args, **kwargs):
+            if not result_cache.backend.shared:
+                return f(db, *args, **kwargs)
+            updated_at = db.query(func.max(model.updated_at)).scalar()
+            etag = _make_etag(model.__tablename__, updated_at, result_cache.version(entity))
+            return _conditional_response(f, (db, *args), kwargs, etag, None)
+        return decorated_function
+    return decorator
@@ -0,0 +1,173 @@
+# export.py
+import csv
+import io
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, request, stream_with_context
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, Numeric, SmallInteger, String
+from utils.query_helpers import model_columns
+from utils.serialization import dumps
+
+# Rows fetched from the server-side cursor per round trip, and so the most rows held in memory at once
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+# Rows per Parquet row group, batches are collected up to this size before they are written
+EXPORT_PARQUET_ROW_GROUP_SIZE = int(os.getenv('EXPORT_PARQUET_ROW_GROUP_SIZE', 65536))
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+COLUMNAR_FORMATS = ('arrow', 'parquet')
+
+# pyarrow is an optional dependency, only needed for the Arrow and Parquet formats
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+def _export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+# Export format for the request: the format parameter when given, otherwise the best match for the Accept header
+# (CSV when the client accepts anything)
+def requested_export_format(default='csv'):
+    export_format = request.args.get('format')
+    if export_format:
+        return export_format
+    mimetype = request.accept_mimetypes.best_match(list(EXPORT_FORMATS.values()))
+    return next((name for name, value in EXPORT_FORMATS.items() if value == mimetype), default)
+
+# Arrow type of a column, so timestamps, dates, decimals and integers keep their types in the columnar formats
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, Numeric) and not isinstance(column_type, Float) and column_type.asdecimal:
+        return pyarrow.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, Float):
+        return pyarrow.float64()
+    if isinstance(column_type, BigInteger):
+        return pyarrow.int64()
+    if isinstance(column_type, SmallInteger):
+        return pyarrow.int16()
+    if isinstance(column_type, Integer):
+        return pyarrow.int32()
+    if isinstance(column_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column_type, DateTime):
+        return pyarrow.timestamp('us', tz='UTC' if column_type.timezone else None)
+    if isinstance(column_type, Date):
+        return pyarrow.date32()
+    if isinstance(column_type, String):
+        return pyarrow.string()
+    raise ValueError(f"Column '{column.key}' cannot be exported as Arrow.")
+
+def _arrow_schema(columns):
+    return pyarrow.schema([pyarrow.field(column.name, _arrow_type(column), nullable=column.nullable) for column in columns])
+
+# Write-only file handed to the Arrow writers, collecting what they write until the next chunk is taken. It keeps
+# counting positions across chunks, Parquet records byte offsets in its footer
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+# Turns each batch of rows into an Arrow record batch and writes it as an Arrow IPC stream, or into Parquet row groups
+def _columnar_chunks(result, columns, export_format):
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+
+    def record_batch(rows):
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        return pyarrow.record_batch([pyarrow.array(column, type=field.type) for column, field in zip(values, schema)], schema=schema)
+
+    if export_format == 'arrow':
+        with pyarrow.ipc.new_stream(sink, schema) as writer:
+            for rows in result.partitions():
+                writer.write_batch(record_batch(rows))
+                yield sink.take()
+    else:
+        with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+            batches, buffered = [], 0
+            for rows in result.partitions():
+                batches.append(record_batch(rows))
+                buffered += len(rows)
+                if buffered >= EXPORT_PARQUET_ROW_GROUP_SIZE:
+                    writer.write_table(pyarrow.Table.from_batches(batches, schema=schema))
+                    batches, buffered = [], 0
+                    yield sink.take()
+            if batches:
+                writer.write_table(pyarrow.Table.from_batches(batches, schema=schema))
+    yield sink.take()
+
+# Returns a generator of the query's rows as CSV or NDJSON text, or Arrow IPC / Parquet bytes, one chunk per batch. The rows are plain column tuples
+# read through a server-side cursor (yield_per), so neither ORM objects nor more than one batch of rows are kept in memory.
+# fields limits the export to those columns
+def export_rows(query, model, export_format, fields=None, batch_size=EXPORT_BATCH_SIZE):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}.")
+    if export_format in COLUMNAR_FORMATS and pyarrow is None:
+        raise ValueError(f"The {export_format} format requires the pyarrow package.")
+    return _export_chunks(query, model, export_format, fields, batch_size)
+
+# Reads the rows on the request's own session. stream_export() wraps the generator in stream_with_context, which keeps
+# the request context (and so the session) open until the body has been streamed; the teardown only runs afterwards.
+# The session is closed here as soon as the export ends or is aborted, which hands its connection back to the pool
+def _export_chunks(query, model, export_format, fields, batch_size):
+    columns = model_columns(model)
+    if fields is not None:
+        columns = [column for column in columns if column.key in fields]
+    names = [column.name for column in columns]
+    try:
+        result = query.session.execute(query.with_entities(*columns).statement, execution_options={'yield_per': batch_size})
+
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            for rows in result.partitions():
+                writer.writerows([_export_value(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        elif export_format in COLUMNAR_FORMATS:
+            yield from _columnar_chunks(result, columns, export_format)
+        else:
+            for rows in result.partitions():
+                yield ''.join(dumps(dict(zip(names, row))) + '\n' for row in rows)
+    finally:
+        query.session.close()
+
+# Streams the export as a download, the request (and its database session) stays open until the last row is sent
+def stream_export(query, model, export_format, filename, fields=None):
+    chunks = export_rows(query, model, export_format, fields)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS.get(export_format),
+        headers={'Content-Disposition': f'attachment; filename={filename}.{export_format}'},
+    )
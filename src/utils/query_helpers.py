@@ -1,12 +1,24 @@
 # query_helpers.py
+import base64
 import json
-from sqlalchemy import and_, or_
+import re
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from sqlalchemy import Float, Index, Integer, Numeric, Text, and_, or_, bindparam, cast, func, inspect, literal_column, select, text, tuple_
+from utils.serialization import model_serializer
 
+# Parses the JSON filter parameter, an empty parameter means no filters
 def parse_filter_params(filter_string):
+    if not filter_string:
+        return {}
     try:
-        return json.loads(filter_string)
+        filters = json.loads(filter_string)
     except (ValueError, TypeError):
-        return {}
+        raise ValueError('filter must be a JSON object.')
+    if not isinstance(filters, dict):
+        raise ValueError('filter must be a JSON object.')
+    return filters
 
 def parse_sort_params(sort_string):
     try:
@@ -14,21 +26,438 @@ def parse_sort_params(sort_string):
     except (ValueError, TypeError):
         return {}
 
+# Integer values given as strings, e.g. "42" or "-7"
+INTEGER_STRING = re.compile(r'[+-]?\d+')
+
+# Converts a JSON value into the python type of a column, raising ValueError naming what was expected otherwise:
+# integer columns take integral numbers or digit strings, numeric columns numbers or numeric strings, date and
+# timestamp columns ISO strings and text columns strings. Shared by the filters and the bulk item checks
+def coerce_column_value(column, value):
+    column_type = column.type
+    if isinstance(column_type, Integer):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and INTEGER_STRING.fullmatch(value):
+            return int(value)
+        raise ValueError('an integer')
+    if isinstance(column_type, (Numeric, Float)):
+        if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+            try:
+                number = Decimal(str(value))
+            except InvalidOperation:
+                number = None
+            if number is not None and number.is_finite():
+                return number if column_type.asdecimal else float(number)
+        raise ValueError('a number')
+    python_type = column_type.python_type
+    if python_type in (date, datetime):
+        if isinstance(value, str):
+            try:
+                return python_type.fromisoformat(value)
+            except ValueError:
+                pass
+        raise ValueError('an ISO timestamp' if python_type is datetime else 'an ISO date')
+    if not isinstance(value, python_type):
+        raise ValueError('a string' if python_type is str else f'a {python_type.__name__}')
+    return value
+
+# Converts a JSON filter value into the python type of the column it is compared with
+def _coerce_filter_value(column, value):
+    if value is None:
+        return None
+    try:
+        return coerce_column_value(column, value)
+    except ValueError as e:
+        raise ValueError(f"Invalid value {value!r} for filter on '{column.name}', expected {e}.")
+
+def _filter_list(column, values, operator_name, length=None):
+    if not isinstance(values, list) or (length is not None and len(values) != length):
+        expected = f'a list of {length} values' if length else 'a list'
+        raise ValueError(f"'{operator_name}' on '{column.name}' expects {expected}.")
+    return [_coerce_filter_value(column, value) for value in values]
+
+# Builds the predicate for one filter operator, every predicate compares the bare column so it stays sargable
+def _filter_condition(column, operator_name, value):
+    if operator_name == 'eq':
+        value = _coerce_filter_value(column, value)
+        return column.is_(None) if value is None else column == value
+    if operator_name == 'ne':
+        value = _coerce_filter_value(column, value)
+        return column.isnot(None) if value is None else column != value
+    if operator_name in ('gt', 'gte', 'lt', 'lte'):
+        value = _coerce_filter_value(column, value)
+        if value is None:
+            raise ValueError(f"'{operator_name}' on '{column.name}' needs a value.")
+        return {'gt': column > value, 'gte': column >= value, 'lt': column < value, 'lte': column <= value}[operator_name]
+    if operator_name == 'in':
+        return column.in_(_filter_list(column, value, operator_name))
+    if operator_name == 'between':
+        low, high = _filter_list(column, value, operator_name, length=2)
+        return column.between(low, high)
+    if operator_name == 'is_null':
+        if not isinstance(value, bool):
+            raise ValueError(f"'is_null' on '{column.name}' expects true or false.")
+        return column.is_(None) if value else column.isnot(None)
+    raise ValueError(f"Unknown filter operator '{operator_name}', expected one of: {', '.join(FILTER_OPERATORS)}.")
+
+# Operators accepted in an operator object, e.g. {"mileage": {"gte": 10000}}
+FILTER_OPERATORS = ('eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'in', 'between', 'is_null')
+
+# Applies structured filters to a query. Each key is a column name and each value is either a plain value
+# (equality), a list (IN) or an operator object such as {"gte": 10000} or {"between": [from, to]}
 def build_filter_query(query, filters, model):
     for key, value in filters.items():
-        if hasattr(model, key):
-            column = getattr(model, key)
-            if isinstance(value, list):
-                query = query.filter(column.in_(value))
-            else:
-                query = query.filter(column == value)
+        column = model.__table__.columns.get(key)
+        # columns without a plain python type (such as search vectors) cannot be filtered on
+        if column is None or column.type.python_type is object:
+            raise ValueError(f"Cannot filter by '{key}'.")
+        if isinstance(value, dict):
+            if not value:
+                raise ValueError(f"Filter on '{key}' has no operators.")
+            for operator_name, operand in value.items():
+                query = query.filter(_filter_condition(column, operator_name, operand))
+        elif isinstance(value, list):
+            query = query.filter(_filter_condition(column, 'in', value))
+        else:
+            query = query.filter(_filter_condition(column, 'eq', value))
+    return query
+
+# Converts a time range bound for a column. Date columns take ISO dates or timestamps: a timestamp bound falls on its
+# day, except an exclusive end with a time of day, which moves to the next day so the rows of that day stay included
+def _time_range_bound(column, value, exclusive_end=False):
+    if column.type.python_type is not date:
+        return _coerce_filter_value(column, value)
+    try:
+        moment = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid value {value!r} for '{column.name}', expected an ISO date or timestamp.")
+    if exclusive_end and moment.time() != datetime.min.time():
+        return moment.date() + timedelta(days=1)
+    return moment.date()
+
+# Limits a query to rows whose time column falls in [start, end), both bounds are optional ISO dates or timestamps
+def apply_time_range(query, column, start=None, end=None):
+    if start:
+        query = query.filter(column >= _time_range_bound(column, start))
+    if end:
+        query = query.filter(column < _time_range_bound(column, end, exclusive_end=True))
     return query
 
+# Rejects sort columns the model does not declare as sortable and unknown sort orders
+def validate_sorting(model, sort_by, sort_order):
+    if sort_by not in model.sortable_columns:
+        raise ValueError(f"Cannot sort by '{sort_by}', expected one of: {', '.join(model.sortable_columns)}.")
+    if sort_order not in ('asc', 'desc'):
+        raise ValueError("sortOrder must be 'asc' or 'desc'.")
+
+# Search modes: substring matching of the search document, and full-text search of the indexed search vector for the
+# models that have one
+SEARCH_MODES = ('substring', 'fulltext')
+
+# Rejects search modes the endpoint does not support instead of falling back to substring search
+def validate_search_mode(mode, modes=SEARCH_MODES):
+    if mode not in modes:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of: {', '.join(modes)}.")
+
+# Whether the sort column alone orders rows deterministically: the primary key itself, or a unique non-null column
+# whose unique index serves the ORDER BY without a (column, primary key) index
+def _orders_alone(sort_column, pk_column):
+    return sort_column is pk_column or (sort_column.unique and not sort_column.nullable)
+
+# Orders by the sort column with the primary key as a deterministic tiebreaker, both in the same
+# direction so the (column, primary key) index can be walked forwards or backwards
 def apply_sorting_query(query, sort_by, order, model):
-    if hasattr(model, sort_by):
-        sort_column = getattr(model, sort_by)
-        if order == 'desc':
-            query = query.order_by(sort_column.desc())
+    sort_column = model.__table__.columns[sort_by]
+    pk_column = get_primary_key(model)
+    order_columns = [sort_column] if _orders_alone(sort_column, pk_column) else [sort_column, pk_column]
+    if order == 'desc':
+        return query.order_by(*[column.desc() for column in order_columns])
+    return query.order_by(*[column.asc() for column in order_columns])
+
+# Declares the (sort column, primary key) indexes that let ORDER BY ... LIMIT walk an index. Unique columns are
+# sorted without the tiebreaker and walk their unique index instead
+def sort_indexes(table_name, pk_name, sortable_columns, unique_columns=()):
+    return tuple(
+        Index(f'ix_{table_name}_{column}_{pk_name}', column, pk_name)
+        for column in sortable_columns if column != pk_name and column not in unique_columns
+    )
+
+# Concatenates text columns into a single expression so one trigram index can serve substring search
+# Separators are SQL literals rather than bound parameters so the query matches the indexed expression exactly
+def search_document(*columns):
+    document = None
+    for column in columns:
+        part = func.coalesce(cast(column, Text), literal_column("''"))
+        document = part if document is None else document.op('||')(literal_column("' '")).op('||')(part)
+    return document
+
+# Declares the GIN trigram index backing a search document on the model's table (requires pg_trgm)
+def trigram_index(model, name, document):
+    index = Index(
+        name,
+        document.label('search_document'),
+        postgresql_using='gin',
+        postgresql_ops={'search_document': 'gin_trgm_ops'},
+    )
+    model.__table__.append_constraint(index)
+    return index
+
+# Text search configuration for queries, must match the one the stored search vectors are generated with
+FULLTEXT_CONFIG = 'english'
+
+# Splits a single word into to_tsquery lexemes at its punctuation, as to_tsvector indexes "oil-change" as "oil" and
+# "change"; a trailing * turns the last part into a prefix match
+def _tsquery_words(word):
+    is_prefix = word.endswith('*')
+    parts = [part for part in re.split(r'\W+', word) if part]
+    if parts and is_prefix:
+        parts[-1] = f'{parts[-1]}:*'
+    return parts
+
+# Converts user input into to_tsquery syntax: words are AND'ed together, "quoted phrases" must
+# appear in order and brak* matches any word starting with brak
+def build_tsquery(search_term):
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', search_term):
+        if phrase:
+            words = [part for w in phrase.split() for part in _tsquery_words(w)]
+            if words:
+                terms.append('(' + ' <-> '.join(words) + ')')
         else:
-            query = query.order_by(sort_column.asc())
-    return query
+            # the parts of a word are AND'ed like separate words
+            terms.extend(_tsquery_words(word))
+    if not terms:
+        raise ValueError('Search query has no searchable words.')
+    return ' & '.join(terms)
+
+# Filters a query to rows whose search vector matches the search term, returning (query, rank expression)
+def apply_fulltext_search(query, vector_column, search_term):
+    tsquery = func.to_tsquery(FULLTEXT_CONFIG, build_tsquery(search_term))
+    rank = func.ts_rank_cd(vector_column, tsquery)
+    return query.filter(vector_column.bool_op('@@')(tsquery)), rank
+
+# Returns the primary key column of a model (used as the keyset tiebreaker)
+def get_primary_key(model):
+    return inspect(model).primary_key[0]
+
+# Mapped columns of a model in table order, the same fields its to_dict() returns
+def model_columns(model):
+    return [attribute.columns[0] for attribute in inspect(model).column_attrs]
+
+# Parses the comma separated fields parameter into column names, no parameter means every column
+def parse_fields(model, fields_string):
+    if not fields_string:
+        return None
+    names = [name.strip() for name in fields_string.split(',') if name.strip()]
+    available = [column.key for column in model_columns(model)]
+    for name in names:
+        if name not in available:
+            raise ValueError(f"Cannot select field '{name}', expected one of: {', '.join(available)}.")
+    return names or None
+
+# Selects plain column tuples instead of ORM objects, skipping identity map bookkeeping and attribute instrumentation.
+# With fields only those columns are read (plus the primary key and any required columns, which keyset cursors need).
+# Filters, ordering and pagination applied to the query carry over unchanged
+def project_columns(query, model, fields=None, required=()):
+    return query.with_entities(*_selected_columns(model, fields, required))
+
+def _selected_columns(model, fields=None, required=()):
+    columns = model_columns(model)
+    if fields is not None:
+        wanted = {get_primary_key(model).key, *fields, *required}
+        columns = [column for column in columns if column.key in wanted]
+    return columns
+
+# Serializes projected rows straight into response dicts through the model's precomputed serializer, limited to the
+# requested fields
+def rows_to_dicts(rows, model, fields=None):
+    return model_serializer(model).rows(rows, fields)
+
+# Primary key lookups are built once per model (and fieldset) with the key as a bound parameter. Reusing the statement
+# skips building the query and computing its cache key on every call, the SQL comes straight from the engine's
+# compiled cache. Execute with {'pk': value}
+@lru_cache(maxsize=None)
+def lookup_statement(model):
+    return select(model).where(get_primary_key(model) == bindparam('pk')).limit(1)
+
+@lru_cache(maxsize=256)
+def _row_lookup_statement(model, fields):
+    return select(*_selected_columns(model, fields)).where(get_primary_key(model) == bindparam('pk')).limit(1)
+
+# Returns the ORM object with the given primary key, or None when it does not exist
+def get_by_primary_key(db, model, pk_value):
+    return db.scalars(lookup_statement(model), {'pk': pk_value}).first()
+
+# Returns one row by primary key as a dict of the requested fields, or None when it does not exist
+def get_row(db, model, pk_value, fields=None):
+    statement = _row_lookup_statement(model, tuple(fields) if fields is not None else None)
+    row = db.execute(statement, {'pk': pk_value}).first()
+    return rows_to_dicts([row], model, fields)[0] if row is not None else None
+
+# Converts a sort value into something json can store in a cursor
+def _dump_cursor_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+# Converts a cursor value back into the python type of the sort column
+def _load_cursor_value(value, column):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+# Encodes the sort column, order and the last row's (sort value, primary key) into an opaque token
+def encode_cursor(sort_by, sort_order, value, pk):
+    payload = {'s': sort_by, 'o': sort_order, 'v': _dump_cursor_value(value), 'k': pk}
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return token.decode().rstrip('=')
+
+# Decodes a cursor token into (sort value, primary key); an empty token means the first page
+def decode_cursor(token, sort_by, sort_order, model):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        column = model.__table__.columns[payload['s']]
+        value, pk = _load_cursor_value(payload['v'], column), int(payload['k'])
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError('Invalid cursor.')
+    if payload['s'] != sort_by or payload.get('o') != sort_order:
+        raise ValueError('Cursor does not match the requested sorting.')
+    return value, pk
+
+# Builds the WHERE clause that seeks past the last seen (sort value, primary key)
+# Postgres sorts NULLs last ascending and first descending, so nullable columns need explicit handling
+def _keyset_condition(sort_column, pk_column, sort_order, value, pk):
+    descending = sort_order == 'desc'
+    if sort_column is pk_column:
+        return pk_column < pk if descending else pk_column > pk
+    if _orders_alone(sort_column, pk_column):
+        return sort_column < value if descending else sort_column > value
+
+    if value is None:
+        after_key = pk_column < pk if descending else pk_column > pk
+        tied = and_(sort_column.is_(None), after_key)
+        return or_(sort_column.isnot(None), tied) if descending else tied
+
+    if descending:
+        condition = tuple_(sort_column, pk_column) < tuple_(value, pk)
+    else:
+        condition = tuple_(sort_column, pk_column) > tuple_(value, pk)
+    if sort_column.nullable and not descending:
+        condition = or_(condition, sort_column.is_(None))
+    return condition
+
+# Rejects a page size below one, which would give an empty page or a negative OFFSET
+def validate_page_size(per_page):
+    if per_page < 1:
+        raise ValueError('per_page must be a positive integer.')
+
+# Applies keyset (seek) pagination to a query and returns (rows, next_cursor)
+def keyset_paginate(query, model, sort_by, sort_order, cursor, per_page):
+    validate_page_size(per_page)
+    validate_sorting(model, sort_by, sort_order)
+    sort_column = model.__table__.columns[sort_by]
+    pk_column = get_primary_key(model)
+
+    last_seen = decode_cursor(cursor, sort_by, sort_order, model)
+    if last_seen is not None:
+        query = query.filter(_keyset_condition(sort_column, pk_column, sort_order, *last_seen))
+    query = apply_sorting_query(query, sort_by, sort_order, model)
+
+    # Fetches one extra row to find out whether another page exists
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, getattr(last, sort_by), getattr(last, pk_column.key))
+    return rows, next_cursor
+
+# Ways of computing the total for a search page, from most to least expensive
+COUNT_STRATEGIES = ('exact', 'estimated', 'capped', 'has_more')
+
+# Highest total counted by the 'capped' strategy, larger totals are reported as e.g. "1000+"
+COUNT_CAP = 1000
+
+# Row estimate kept by VACUUM/ANALYZE (-1 means never analysed). Autovacuum never analyses a partitioned table itself
+# (trip_logs), so its estimate is the sum over the partitions that have been analysed
+TABLE_ROWS_ESTIMATE_SQL = text("""
+    SELECT CASE WHEN parent.relkind = 'p' THEN (
+        SELECT sum(child.reltuples) FILTER (WHERE child.reltuples >= 0)
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = parent.oid
+    ) ELSE parent.reltuples END::bigint
+    FROM pg_class parent
+    WHERE parent.oid = CAST(:table_name AS regclass)
+""")
+
+# Reads the table's row estimate instead of counting, None when there is none
+def _estimate_table_rows(db, model):
+    estimate = db.execute(TABLE_ROWS_ESTIMATE_SQL, {'table_name': model.__tablename__}).scalar()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+# Reads the planner's row estimate for a filtered query from EXPLAIN, against the tables or views the query reads
+def _estimate_query_rows(db, query):
+    compiled = query.order_by(None).statement.compile(
+        dialect=db.get_bind().dialect,
+        schema_translate_map=query.get_execution_options().get('schema_translate_map'),
+        render_schema_translate=True,
+        compile_kwargs={'render_postcompile': True},
+    )
+    plan = db.connection().exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled.string}', compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+# Counts the rows matched by a query using the given strategy
+def count_rows(db, query, model, strategy):
+    if strategy == 'has_more':
+        return None
+    if strategy == 'capped':
+        total = query.order_by(None).limit(COUNT_CAP + 1).count()
+        return f'{COUNT_CAP}+' if total > COUNT_CAP else total
+    if strategy == 'estimated':
+        # the table statistics only cover the table itself, a query over the archive views is always explained
+        unfiltered = query.whereclause is None and 'schema_translate_map' not in query.get_execution_options()
+        estimate = _estimate_table_rows(db, model) if unfiltered else None
+        # without statistics the planner's estimate is still far cheaper than counting the table
+        return estimate if estimate is not None else _estimate_query_rows(db, query)
+    return query.order_by(None).count()
+
+# Fetches one page with offset pagination plus the total using the given count strategy
+# Returns (rows, total, has_more); total is None for 'has_more' and a string such as "1000+" when capped
+def paginate(db, query, model, page, per_page, count_strategy):
+    if page < 1:
+        raise ValueError('page must be a positive integer.')
+    validate_page_size(per_page)
+    if count_strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_STRATEGIES)}.")
+    skip = (page - 1) * per_page
+
+    # Fetches one extra row to find out whether another page exists
+    rows = query.offset(skip).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    seen = skip + len(rows)
+
+    # The last page already tells us the exact total, no count query needed
+    if not has_more and (rows or page == 1):
+        return rows, seen, has_more
+
+    total = count_rows(db, query, model, count_strategy)
+    # Estimates can lag behind the rows actually fetched
+    if count_strategy == 'estimated':
+        total = max(total, seen + has_more)
+    return rows, total, has_more
@@ -0,0 +1,154 @@
+# references.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
+from utils.cache import result_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Reference cache settings: up to REFERENCE_CACHE_MAX_ENTRIES primary keys of vehicles, drivers and routes known to
+# exist are kept per process for at most REFERENCE_CACHE_TTL seconds
+REFERENCE_CACHE_ENABLED = os.getenv('REFERENCE_CACHE_ENABLED', 'true').lower() != 'false'
+REFERENCE_CACHE_MAX_ENTRIES = int(os.getenv('REFERENCE_CACHE_MAX_ENTRIES', 50000))
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 300))
+
+# Small, rarely written tables whose primary keys the trip log, maintenance record and driver writes reference
+REFERENCE_TABLES = ('vehicles', 'drivers', 'routes')
+
+# Process-wide LRU of primary keys seen to exist. Only existence is cached: an unknown ID is always looked up, so a row
+# created in any process is found at once. Each entry carries its table's reference version, which deletes bump
+# through forget_references(); with a shared CACHE_URL backend the version is shared, so every worker process drops
+# its entries together. Should a deleted row still be cached, the foreign key constraint rejects the write and
+# checked_references() reports it like a failed check
+class ReferenceCache:
+    def __init__(self, max_entries=REFERENCE_CACHE_MAX_ENTRIES, ttl=REFERENCE_CACHE_TTL, enabled=REFERENCE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (table, primary key) -> (version, expires_at)
+        self._lock = threading.Lock()
+
+    def cacheable(self, column):
+        return self.enabled and column.table.name in REFERENCE_TABLES and column.primary_key
+
+    def version(self, table_name):
+        return result_cache.backend.counter(f'references:{table_name}')
+
+    # Splits values into those known to exist and those to look up
+    def split(self, table_name, version, values):
+        known, unknown = set(), set()
+        now = time.monotonic()
+        with self._lock:
+            for value in values:
+                entry = self._entries.get((table_name, value))
+                if entry is not None and entry[0] == version and entry[1] > now:
+                    self._entries.move_to_end((table_name, value))
+                    known.add(value)
+                else:
+                    unknown.add(value)
+            self.hits += len(known)
+            self.misses += len(unknown)
+        return known, unknown
+
+    # Remembers values found in the database, tagged with the version read before the lookup
+    def add(self, table_name, version, values):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for value in values:
+                self._entries[(table_name, value)] = (version, expires_at)
+                self._entries.move_to_end((table_name, value))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, table_name, value):
+        with self._lock:
+            self._entries.pop((table_name, value), None)
+
+    def forget(self, table_name):
+        result_cache.backend.incr(f'references:{table_name}')
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+reference_cache = ReferenceCache()
+
+# Drops the cached IDs of a reference table in every process, called by the service layer after deletes
+def forget_references(table_name):
+    reference_cache.forget(table_name)
+
+# Checks that every referenced row exists with a single query, raising ValueError with the message of the first one missing.
+# references is a list of (primary key column, value, message), references without a value are skipped. IDs of
+# vehicles, drivers and routes already known to exist are answered from the reference cache unless use_cache is False
+def check_references(db, references, use_cache=True):
+    references = [(column, value, message) for column, value, message in references if value]
+    versions = {}
+    unknown = []
+    for column, value, message in references:
+        if reference_cache.cacheable(column):
+            table_name = column.table.name
+            if table_name not in versions:
+                versions[table_name] = reference_cache.version(table_name)
+            if use_cache and reference_cache.split(table_name, versions[table_name], [value])[0]:
+                continue
+        unknown.append((column, value, message))
+    if not unknown:
+        return
+    found = db.execute(select(*[exists().where(column == value) for column, value, _ in unknown])).one()
+    for (column, value, message), exists_ in zip(unknown, found):
+        if not exists_:
+            if reference_cache.cacheable(column):
+                reference_cache.discard(column.table.name, value)
+            raise ValueError(message)
+        if reference_cache.cacheable(column):
+            reference_cache.add(column.table.name, versions[column.table.name], [value])
+
+# Checks the references of a write, then runs its flush and commit. A referenced row deleted since the check (by
+# another process while its ID was cached here, or concurrently) fails the foreign key constraint: the transaction
+# is rolled back and the references are checked again against the database, so the write fails with the same
+# ValueError as the check. Other integrity errors are raised unchanged
+@contextmanager
+def checked_references(db, references):
+    check_references(db, references)
+    try:
+        yield
+    except IntegrityError:
+        db.rollback()
+        check_references(db, references, use_cache=False)
+        raise
+
+# Returns which of the given values exist in a primary key column, one query for the whole set (values known to
+# exist in a reference table are not looked up again)
+def existing_references(db, column, values):
+    values = {value for value in values if value}
+    if not values:
+        return set()
+    if not reference_cache.cacheable(column):
+        return set(db.scalars(select(column).where(column.in_(values))))
+    table_name = column.table.name
+    version = reference_cache.version(table_name)
+    known, unknown = reference_cache.split(table_name, version, values)
+    if unknown:
+        found = set(db.scalars(select(column).where(column.in_(unknown))))
+        reference_cache.add(table_name, version, found)
+        known |= found
+    return known